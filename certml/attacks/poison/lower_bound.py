@@ -2,6 +2,7 @@
 
 from certml.certify.poison import UpperBound
 import numpy as np
+from certml.utils.data import sample_without_replacement
 
 
 class LowerBound(object):
@@ -21,9 +22,8 @@ class LowerBound(object):
 
         num_iter = x_c.shape[0] - self.upper_bound.num_iter_to_throw_out
 
-        idx_to_sample = np.random.choice(
+        idx_to_sample = sample_without_replacement(
             num_iter,
-            size=int(np.round(epsilon * self.upper_bound.x.shape[0])),
-            replace=False) + self.upper_bound.num_iter_to_throw_out
+            int(np.round(epsilon * self.upper_bound.x.shape[0]))) + self.upper_bound.num_iter_to_throw_out
 
         return x_c[idx_to_sample, :], y_c[idx_to_sample]
@@ -0,0 +1,67 @@
+"""Upper Bound Unit Tests"""
+
+import threading
+import numpy as np
+import pytest
+from certml.pipeline import Pipeline
+from certml.classifiers import LinearSVM
+from certml.defenses import DataOracle
+from certml.certify.poison import UpperBound
+
+
+def _make_pipeline():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(200, 10))
+    y = np.where(rng.uniform(size=200) > 0.5, 1, -1)
+    X[y == 1, :] += 2.0
+
+    oracle = DataOracle(mode='sphere', radius=3.0)
+    pipeline = Pipeline([
+        ('Data Oracle', oracle),
+        ('Linear SVM', LinearSVM(upper_params_norm_sq=0.05, use_bias=True))
+    ])
+    pipeline.fit_trusted(X, y)
+    pipeline.fit(X, y)
+    return pipeline, oracle
+
+
+class TestUpperBound(object):
+    """Upper Bound Unit Tests"""
+
+    def test_attack_points_feasible_float32(self):
+        pipeline, oracle = _make_pipeline()
+        bounds = UpperBound(pipeline, norm_sq_constraint=1, max_iter=200, num_iter_to_throw_out=0,
+                            learning_rate=1, dtype=np.float32, verbose=False)
+        bounds.cert_rda(0.1)
+
+        X_kept, _ = oracle.transform(bounds.x_c, bounds.y_c)
+        assert X_kept.shape[0] == bounds.x_c.shape[0]
+
+    @pytest.mark.parametrize('n_jobs', [2, -2])
+    def test_cvx_matches_closed_form(self, n_jobs):
+        pipeline, _ = _make_pipeline()
+        closed_form = UpperBound(pipeline, norm_sq_constraint=1, max_iter=50, num_iter_to_throw_out=0,
+                                 learning_rate=1, dtype=np.float64, verbose=False)
+        closed_form_bound = closed_form.cert_rda(0.1)[0]
+
+        num_threads = threading.active_count()
+        cvx_bounds = UpperBound(pipeline, norm_sq_constraint=1, max_iter=50, num_iter_to_throw_out=0,
+                                learning_rate=1, dtype=np.float64, n_jobs=n_jobs, verbose=False)
+        cvx_bounds._use_closed_form = False
+        cvx_bounds._cached_probs = dict(
+            (y, cvx_bounds._build_feasible_set_problem(y)) for y in cvx_bounds._unique_y)
+
+        cvx_bound = cvx_bounds.cert_rda(0.1)[0]
+        assert threading.active_count() == num_threads
+        assert np.isclose(cvx_bound, closed_form_bound, rtol=1e-3)
+
+    @pytest.mark.parametrize('dtype', [np.float32, np.float64])
+    def test_certify_matches_cert_rda(self, dtype):
+        pipeline, _ = _make_pipeline()
+        bounds = UpperBound(pipeline, norm_sq_constraint=1, max_iter=50, num_iter_to_throw_out=0,
+                            learning_rate=1, dtype=dtype, verbose=False)
+        total_loss, good_loss, bad_loss = bounds.certify(np.array([0.05, 0.1, 0.2]))
+
+        for idx, epsilon in enumerate([0.05, 0.1, 0.2]):
+            assert np.allclose(bounds.cert_rda(epsilon), (total_loss[idx], good_loss[idx], bad_loss[idx]))
+        assert np.isclose(total_loss[2], good_loss[2] + 0.2 * bad_loss[2])
@@ -1,14 +1,18 @@
 """Certify Machine Learning Pipeline"""
 
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 import numpy as np
+import scipy.sparse as sparse
 import cvxpy as cvx
-from certml.utils.data import get_projection_matrix
+from joblib import Parallel, delayed, effective_n_jobs
+from certml.utils.data import get_projection_matrix, minimize_linear_over_feasible_set
 
 
 class UpperBound(object):
     """Upper Bound on Loss due to Data Poisoning Attacks"""
     def __init__(self, pipeline, norm_sq_constraint=None, max_iter=None, num_iter_to_throw_out=None,
-                 learning_rate=None, verbose=True, print_interval=500):
+                 learning_rate=None, dtype=np.float32, n_jobs=1, verbose=True, print_interval=500):
         """Upper Bound on Loss due to Data Poisoning Attacks
 
         Parameters
@@ -19,6 +23,15 @@ class UpperBound(object):
         max_iter : int
         num_iter_to_throw_out : int
         learning_rate : float
+        dtype : np.dtype
+            Floating point type of the clean data and the model during certification.
+            The step size (lambda) and the candidate attack points are always kept
+            in double precision.
+        n_jobs : int
+            Number of parallel jobs. certify splits the epsilons between processes.
+            cert_rda solves the attack point problems of the classes in threads
+            when they are solved with CVX. Negative values follow joblib, e.g. -1 uses
+            all CPUs and -2 all but one.
         verbose : bool
         print_interval : int
         """
@@ -27,6 +40,11 @@ class UpperBound(object):
         self.max_iter = max_iter
         self.num_iter_to_throw_out = num_iter_to_throw_out
         self.learning_rate = learning_rate
+        self.dtype = dtype
+        self.n_jobs = n_jobs
+
+        # Resolved once so the process and thread pools agree on the number of jobs
+        self._n_jobs = effective_n_jobs(n_jobs)
 
         # Debug Parameters
         self.verbose = verbose
@@ -48,12 +66,22 @@ class UpperBound(object):
 
         self.loss = classifier['loss']
         self.loss_grad = classifier['loss_grad']
+        self.loss_and_grad = classifier.get('loss_and_grad')
         self.loss_cvx = classifier['loss_cvx']
+        self.loss_linear = classifier.get('loss_linear', False)
         self.x = classifier['data']['features']
         self.y = classifier['data']['labels']
 
+        # The clean data is passed over every iteration, so make sure it is
+        # contiguous and in the working precision. Sparse data (e.g. text) is
+        # kept sparse in CSR format so X.dot(w) and X^T.dot(v) stay sparse products.
+        if sparse.issparse(self.x):
+            self.x = self.x.tocsr().astype(self.dtype, copy=False)
+        else:
+            self.x = np.ascontiguousarray(self.x, dtype=self.dtype)
+
         start_w = classifier['params']['coef']
-        self.init_w = np.zeros_like(start_w)
+        self.init_w = np.zeros_like(start_w, dtype=self.dtype)
         self.init_b = 0
 
         self.constraints_cvx = defense['constraints_cvx']
@@ -61,6 +89,25 @@ class UpperBound(object):
         self.centroids = defense['data']['centroids']
         self.centroid_vec = defense['data']['centroid_vec']
 
+        # Labels are fixed, so only find the classes once
+        self._unique_y = np.array(sorted(set(self.y)))
+        self.sphere_radii = defense['data'].get('sphere_radii')
+        self.slab_radii = defense['data'].get('slab_radii')
+
+        # A linear objective over a bounded sphere and slab can be solved in
+        # closed form. Otherwise fall back to solving it with CVX.
+        self._use_closed_form = self.loss_linear and \
+            self.sphere_radii is not None and self.slab_radii is not None and \
+            np.all(np.isfinite(self.sphere_radii))
+
+        # Build the attack point optimization problem for each class once.
+        # Only the parameter values change between iterations, so CVX does
+        # not need to set up the problem from scratch every time.
+        self._cached_probs = {}
+        if not self._use_closed_form:
+            for y in self._unique_y:
+                self._cached_probs[y] = self._build_feasible_set_problem(y)
+
         self.x_c = None
         self.y_c = None
 
@@ -74,6 +121,10 @@ class UpperBound(object):
     def certify(self, epsilons):
         """ Certify the Machine Learning Pipeline with particular Epsilons
 
+        Runs the certification of cert_rda for all epsilons together, sharing
+        the passes over the clean data. The losses are those of the iterate with
+        the lowest total loss (the upper bound U*), as in cert_rda.
+
         Parameters
         ----------
         epsilons : np.ndarray of shape (Num Epsilons,)
@@ -82,51 +133,169 @@ class UpperBound(object):
         Returns
         -------
         total_loss : np.ndarray of shape (Num Epsilons,)
-            Total loss due to both normal and adversarial data
+            Upper bound on the total loss due to both normal and adversarial data
         good_loss : np.ndarray of shape (Num Epsilons,)
-            Loss due to only normal data
+            Loss due to only normal data at the upper bound
         bad_loss : np.ndarray of shape (Num Epsilons,)
-            Loss due to only adversarial data
+            Loss due to only adversarial data at the upper bound
         """
-        total_loss = np.zeros_like(epsilons)
-        good_loss = np.zeros_like(epsilons)
-        bad_loss = np.zeros_like(epsilons)
-
-        for idx, epsilon in enumerate(epsilons):
-            total_loss_i, good_loss_i, bad_loss_i = self.cert_rda(epsilon)
-
-            total_loss[idx] = total_loss_i
-            good_loss[idx] = good_loss_i
-            bad_loss[idx] = bad_loss_i
+        # Every entry is filled in below, so there is no need to zero them
+        total_loss = np.empty_like(epsilons, dtype=float)
+        good_loss = np.empty_like(epsilons, dtype=float)
+        bad_loss = np.empty_like(epsilons, dtype=float)
+
+        if self._n_jobs > 1 and len(epsilons) > 1:
+            # The epsilons are independent, so split them between processes.
+            # The workers solve the class problems sequentially.
+            epsilon_splits = np.array_split(epsilons, min(self._n_jobs, len(epsilons)))
+            split_results = Parallel(n_jobs=self._n_jobs, backend='loky')(
+                delayed(self._cert_rda)(split) for split in epsilon_splits)
+            results = [result for split_result in split_results for result in split_result]
+        else:
+            with self._class_pool() as class_pool:
+                results = self._cert_rda(epsilons, class_pool=class_pool)
+        self._save_results(results[-1])
+
+        for idx, result in enumerate(results):
+            total_loss[idx] = result[0]
+            good_loss[idx] = result[1]
+            bad_loss[idx] = result[2]
 
         return total_loss, good_loss, bad_loss
 
     def cert_rda(self, epsilon):
-        """Online Certification Algorithm using Regularized Dual Averaging"""
+        """ Online Certification Algorithm using Regularized Dual Averaging
 
-        # Initialize Variables as 0
-        x_bs = np.zeros((self.max_iter, self.x.shape[1]))
-        y_bs = np.zeros(self.max_iter)
-        sum_w = np.zeros(self.x.shape[1])
+        The upper bound is the lowest total loss over all iterates (U* in
+        Algorithm 1 of Steinhardt et al.), and the returned losses are those
+        of that iterate. The results (including the accuracies and the
+        squared norm of the parameters at that iterate) and the candidate
+        attack points of every iterate are saved as attributes.
+
+        Parameters
+        ----------
+        epsilon : float
+            Fraction of normal data add as poisoned data
+
+        Returns
+        -------
+        best_upper_bound : float
+            Upper bound on the total loss due to both normal and adversarial data
+        best_upper_good_loss : float
+            Loss due to only normal data at the upper bound
+        best_upper_bad_loss : float
+            Loss due to only adversarial data at the upper bound
+        """
+        with self._class_pool() as class_pool:
+            result = self._cert_rda(np.array([epsilon]), class_pool=class_pool)[0]
+        self._save_results(result)
+        return self.best_upper_bound, self.best_upper_good_loss, self.best_upper_bad_loss
+
+    def _save_results(self, result):
+        """ Save the Results of _cert_rda as Attributes
+
+        Parameters
+        ----------
+        result : tuple
+            Results returned by _cert_rda
+        """
+        self.best_upper_bound, self.best_upper_good_loss, self.best_upper_bad_loss, \
+            self.best_upper_params_norm_sq, self.best_upper_good_acc, self.best_upper_bad_acc, \
+            self.x_c, self.y_c = result
+
+    @contextmanager
+    def _class_pool(self):
+        """ Thread Pool for the Per Class Attack Point Problems
+
+        The CVX solvers release the GIL, so the independent per class problems
+        can be solved in threads. The closed form is too cheap to benefit, so
+        no pool is created for it (or for n_jobs == 1). The pool is closed when
+        the block exits.
+
+        Yields
+        ------
+        class_pool : ThreadPool or None
+            Thread pool, or None to solve the problems sequentially
+        """
+        class_pool = None
+        if self._n_jobs > 1 and not self._use_closed_form and len(self._unique_y) > 1:
+            class_pool = ThreadPool(self._n_jobs)
+        try:
+            yield class_pool
+        finally:
+            if class_pool is not None:
+                class_pool.close()
+                class_pool.join()
+
+    def _cert_rda(self, epsilons, class_pool=None):
+        """ Online Certification Algorithm using Regularized Dual Averaging
+
+        Runs one RDA trajectory per epsilon. The trajectories diverge after the
+        first step, so the attack points are found per epsilon, but the models
+        are stacked so the clean loss and gradient of every epsilon come from a
+        single pass over the clean data in each iteration.
+
+        Does not modify the certifier, so it can be run for several epsilons in parallel.
+
+        Parameters
+        ----------
+        epsilons : np.ndarray of shape (Num Epsilons,)
+            Array of epsilon (fraction of normal data add as poisoned data)
+        class_pool : ThreadPool
+            Thread pool to solve the per class problems in (see _class_pool)
+
+        Returns
+        -------
+        results : list of tuple
+            For each epsilon, the tuple
+
+            best_upper_bound : float
+            best_upper_good_loss : float
+            best_upper_bad_loss : float
+            best_upper_params_norm_sq : float
+            best_upper_good_acc : float
+            best_upper_bad_acc : float
+            x_bs : np.ndarray of shape (max_iter, dimensions)
+                Candidate attack point features
+            y_bs : np.ndarray of shape (max_iter,)
+                Candidate attack point labels
+        """
+        epsilons = np.asarray(epsilons, dtype=float).reshape(-1)
+        num_eps = epsilons.size
+
+        # Candidate attack points. Every row is written, so they do not need to be initialized.
+        # They lie just inside the feasible set, so they are kept in double precision
+        # whatever the working dtype, or rounding would push them outside.
+        x_bs = np.empty((num_eps, self.max_iter, self.x.shape[1]))
+        y_bs = np.empty((num_eps, self.max_iter))
 
         ##########
         # Line 1 #
         ##########
 
-        # Initialize Sum of Gradients (z)
-        sum_of_grads_w_sq = np.ones(self.x.shape[1])
-        sum_of_grads_w = np.zeros(self.x.shape[1])
-        sum_of_grads_b = 0
+        # Initialize Sum of Gradients (z), one row per epsilon
+        sum_of_grads_w = np.zeros((num_eps, self.x.shape[1]), dtype=self.dtype)
+        sum_of_grads_b = np.zeros(num_eps)
+
+        # Running squared norm of the sum of gradients (||z_w||^2)
+        sum_of_grads_w_norm_sq = np.zeros(num_eps)
 
         # Initialize Upper Bound (U*)
-        best_upper_bound = 10000
+        best_upper_bound = np.full(num_eps, 10000.0)
+        best_upper_good_loss = np.full(num_eps, np.nan)
+        best_upper_bad_loss = np.full(num_eps, np.nan)
+        best_upper_params_norm_sq = np.full(num_eps, np.nan)
+        best_upper_good_acc = np.full(num_eps, np.nan)
+        best_upper_bad_acc = np.full(num_eps, np.nan)
 
         # Initialize ??? (\lambda)
-        current_lambda = 1 / self.learning_rate
+        # The step sizes are kept in double precision whatever the working dtype
+        current_lambda = np.full(num_eps, 1.0 / self.learning_rate)
+        sqrt_norm_sq_constraint = float(np.sqrt(self.norm_sq_constraint))
 
-        # Initialize Model (\theta)
-        w = self.init_w
-        b = self.init_b
+        # Initialize Model (\theta), one row per epsilon
+        w = np.tile(self.init_w, (num_eps, 1))
+        b = np.full(num_eps, float(self.init_b))
 
         ##########
         # Line 2 #
@@ -138,97 +307,167 @@ class UpperBound(object):
             # Line 5 (1st Half) #
             #####################
 
-            # Calculate gradient of loss
-            grad_w, grad_b = self.loss_grad(self.x, self.y, w=w, b=b)
+            # Calculate gradient of loss (and the loss due to clean data for Line 4)
+            good_loss, grad_w, grad_b = self._clean_loss_and_grad(w, b)
 
             if self.verbose:
                 if iter_idx % self.print_interval == 0:
                     print("At iter %s:" % iter_idx)
 
+            for eps_idx, epsilon in enumerate(epsilons):
+
+                ##########
+                # Line 3 #
+                ##########
+
+                # Find the attack point that maximizes loss function.
+                # We do not know which class gives the maximum loss.
+                # Pick the class with the worse (more negative) margin.
+                worst_margin, worst_y_b, worst_x_b = self._find_worst_attack_point(
+                    w[eps_idx], b[eps_idx], class_pool)
+
+                #####################
+                # Line 5 (2nd Half) #
+                #####################
+
+                # Take the gradient with respect to that y
+                if worst_margin < 1:
+                    grad_w[eps_idx] -= epsilon * worst_y_b * worst_x_b
+                    grad_b[eps_idx] -= epsilon * worst_y_b
+
+                #####################
+                # Line 4 (2nd Half) #
+                #####################
+
+                # Loss due to malicious data
+                bad_loss = self.loss(worst_x_b, worst_y_b, w=w[eps_idx], b=b[eps_idx])
+
+                # Store iterate to construct matching lower bound
+                x_bs[eps_idx, iter_idx, :] = worst_x_b
+                y_bs[eps_idx, iter_idx] = worst_y_b
+
+                #####################
+                # Line 4 (1st Half) #
+                #####################
+
+                # Loss due to clean data was calculated with the gradient in Line 5
+                # Since theta = z / lambda, ||theta||^2 follows from the running ||z||^2
+                params_norm_sq = (sum_of_grads_w_norm_sq[eps_idx] + sum_of_grads_b[eps_idx] ** 2) / \
+                    current_lambda[eps_idx] ** 2
+
+                # Total Loss of the Poisoned Dataset
+                total_loss = good_loss[eps_idx] + epsilon * bad_loss
+
+                if best_upper_bound[eps_idx] > total_loss:
+                    best_upper_bound[eps_idx] = total_loss
+                    best_upper_good_loss[eps_idx] = good_loss[eps_idx]
+                    best_upper_bad_loss[eps_idx] = bad_loss
+                    best_upper_params_norm_sq[eps_idx] = params_norm_sq
+                    best_upper_good_acc[eps_idx] = np.mean(
+                        (self.y * (self.x.dot(w[eps_idx]) + b[eps_idx])) > 0)
+                    if worst_margin > 0:
+                        best_upper_bad_acc[eps_idx] = 1.0
+                    else:
+                        best_upper_bad_acc[eps_idx] = 0.0
+
             ##########
-            # Line 3 #
+            # Line 6 #
             ##########
 
-            # Find the attack point that maximizes loss function.
-            # We do not know which class gives the maximum loss.
-            # Pick the class with the worse (more negative) margin.
-            worst_margin = None
-            for y_b in set(self.y):
-
-                class_idx = self.class_map[y_b]
-                x_b = self.minimize_over_feasible_set(y_b, w)
-
-                margin = y_b * (w.dot(x_b) + b)
-                if (worst_margin is None) or (margin < worst_margin):
-                    worst_margin = margin
-                    worst_y_b = y_b
-                    worst_x_b = x_b
-
-            #####################
-            # Line 5 (2nd Half) #
-            #####################
+            # Update Gradient (z[t] = z[t-1] - g[t])
+            # ||z - g||^2 = ||z||^2 - 2 z^T g + ||g||^2 is updated before z changes
+            sum_of_grads_w_norm_sq += np.einsum('ij,ij->i', grad_w, grad_w) - \
+                2 * np.einsum('ij,ij->i', sum_of_grads_w, grad_w)
+            np.maximum(sum_of_grads_w_norm_sq, 0.0, out=sum_of_grads_w_norm_sq)
+            sum_of_grads_w -= grad_w
+            sum_of_grads_b -= grad_b
 
-            # Take the gradient with respect to that y
-            if worst_margin < 1:
-                grad_w -= epsilon * worst_y_b * worst_x_b
-                grad_b -= epsilon * worst_y_b
+            # Update ?? (\lambda[t] = max(...))
+            candidate_lambda = np.sqrt(sum_of_grads_w_norm_sq + sum_of_grads_b ** 2) / sqrt_norm_sq_constraint
+            np.maximum(current_lambda, candidate_lambda, out=current_lambda)
 
-            #####################
-            # Line 4 (2nd Half) #
-            #####################
+            # Update Model (\theta[t] = z[t] / \lambda[t]), keeping w in the working dtype
+            w = np.divide(sum_of_grads_w, current_lambda[:, np.newaxis], out=np.empty_like(sum_of_grads_w),
+                          casting='same_kind')
+            b = sum_of_grads_b / current_lambda
 
-            # Loss due to malicious data
-            bad_loss = self.loss(worst_x_b, worst_y_b, w=w, b=b)
+        return [(float(best_upper_bound[eps_idx]), float(best_upper_good_loss[eps_idx]),
+                 float(best_upper_bad_loss[eps_idx]), float(best_upper_params_norm_sq[eps_idx]),
+                 float(best_upper_good_acc[eps_idx]), float(best_upper_bad_acc[eps_idx]),
+                 x_bs[eps_idx], y_bs[eps_idx])
+                for eps_idx in range(num_eps)]
 
-            # Store iterate to construct matching lower bound
-            x_bs[iter_idx, :] = worst_x_b
-            y_bs[iter_idx] = worst_y_b
+    def _find_worst_attack_point(self, w, b, class_pool=None):
+        """ Find the Worst Attack Point over all Classes
 
-            #####################
-            # Line 4 (1st Half) #
-            #####################
-
-            # Loss due to clean data
-            good_loss = self.loss(self.x, self.y, w=w, b=b)
-            params_norm_sq = (np.linalg.norm(w) ** 2 + b ** 2)
+        Parameters
+        ----------
+        w : np.ndarray of shape (dimensions,)
+            Coefficients
+        b : float
+            Intercept
+        class_pool : ThreadPool
+            Thread pool to solve the per class problems in
 
-            # Total Loss of the Poisoned Dataset
-            total_loss = good_loss + epsilon * bad_loss
+        Returns
+        -------
+        worst_margin : float
+            Margin of the worst attack point
+        worst_y_b : int
+            Label of the worst attack point
+        worst_x_b : np.ndarray of shape (dimensions,)
+            Worst attack point
+        """
+        if class_pool is not None:
+            x_b_all = class_pool.map(lambda y_b: self.minimize_over_feasible_set(y_b, w), self._unique_y)
+        else:
+            x_b_all = [self.minimize_over_feasible_set(y_b, w) for y_b in self._unique_y]
 
-            if best_upper_bound > total_loss:
-                self.best_upper_bound = total_loss
-                self.best_upper_good_loss = good_loss
-                self.best_upper_bad_loss = bad_loss
-                self.best_upper_params_norm_sq = params_norm_sq
-                self.best_upper_good_acc = np.mean((self.y * (self.x.dot(w) + b)) > 0)
-                if worst_margin > 0:
-                    self.best_upper_bad_acc = 1.0
-                else:
-                    self.best_upper_bad_acc = 0.0
+        worst_margin = None
+        for y_b, x_b in zip(self._unique_y, x_b_all):
 
-            ##########
-            # Line 6 #
-            ##########
+            margin = float(y_b * (w.dot(x_b) + b))
+            if (worst_margin is None) or (margin < worst_margin):
+                worst_margin = margin
+                worst_y_b = y_b
+                worst_x_b = x_b
 
-            # Update Gradient (z[t] = z[t-1] - g[t])
-            sum_of_grads_w -= grad_w
-            sum_of_grads_b -= grad_b
+        return worst_margin, worst_y_b, worst_x_b
 
-            # Update ?? (\lambda[t] = max(...))
-            candidate_lambda = np.sqrt(np.linalg.norm(sum_of_grads_w) ** 2 + sum_of_grads_b ** 2) / np.sqrt(
-                self.norm_sq_constraint)
-            if candidate_lambda > current_lambda:
-                current_lambda = candidate_lambda
+    def _clean_loss_and_grad(self, w, b):
+        """ Loss and Gradient on the Clean Data for Several Models
 
-                # Update Model (\theta[t] = z[t] / \lambda[t])
-            w = sum_of_grads_w / current_lambda
-            b = sum_of_grads_b / current_lambda
+        Uses the classifier's fused loss_and_grad if it provides one. It is
+        given the coefficients stacked as columns, so the clean data is only
+        passed over once per iteration for all of the models.
 
-        # Save Candidate Attack Points
-        self.x_c = x_bs
-        self.y_c = y_bs
+        Parameters
+        ----------
+        w : np.ndarray of shape (models, dimensions)
+            Coefficients
+        b : np.ndarray of shape (models,)
+            Intercept
 
-        return self.best_upper_bound, self.best_upper_good_acc, self.best_upper_bad_loss
+        Returns
+        -------
+        loss : np.ndarray of shape (models,)
+            Loss due to clean data
+        grad_w : np.ndarray of shape (models, dimensions)
+            Gradient of coefficients
+        grad_b : np.ndarray of shape (models,)
+            Gradient of intercept
+        """
+        if self.loss_and_grad is not None:
+            loss, grad_w, grad_b = self.loss_and_grad(self.x, self.y, w=w.T, b=b)
+            return np.asarray(loss, dtype=float), grad_w.T, np.asarray(grad_b, dtype=float)
+
+        loss = np.empty(w.shape[0])
+        grad_w = np.empty_like(w)
+        grad_b = np.empty(w.shape[0])
+        for idx in range(w.shape[0]):
+            grad_w[idx], grad_b[idx] = self.loss_grad(self.x, self.y, w=w[idx], b=b[idx])
+            loss[idx] = self.loss(self.x, self.y, w=w[idx], b=b[idx])
+        return loss, grad_w, grad_b
 
     def minimize_over_feasible_set(self, y, w):
         """ Minimize over Feasible Set
@@ -249,7 +488,10 @@ class UpperBound(object):
             c :      class centroid
             c_vec :  vector between the two class centroids
 
-        In certain cases, the optimization problem will be projected down to a
+        If the classifier objective is linear and the defense is bounded by a sphere,
+        the problem is solved in closed form (see minimize_linear_over_feasible_set).
+
+        Otherwise, the optimization problem will be projected down to a
         smaller subspace to simplify the optimization problem. See the correspondence
         with the authors of Steinhardt et al. 2017 below.
 
@@ -273,20 +515,55 @@ class UpperBound(object):
         """
         y_ind = self.class_map[y]
 
+        if self._use_closed_form:
+            # Maximizing 1 - y w^T x is minimizing (y w)^T x
+            return minimize_linear_over_feasible_set(
+                y * w, self.centroids[y_ind, :], self.centroid_vec,
+                self.sphere_radii[y_ind], self.slab_radii[y_ind])
+
         # Get projection matrix to project down to lower subspace
-        d = 3
         projection = get_projection_matrix(w, self.centroids[y_ind, :], self.centroid_vec)
 
-        cvx_x = cvx.Variable(d)
-
-        # Get the objective and constraints from the classifier and defense
-        objective = self.loss_cvx(cvx_x, y=y, w=w, project=projection)
-        constraints = self.constraints_cvx(cvx_x, y=y, project=projection)
-
-        # Setup and solve the optimization problem
-        prob = cvx.Problem(objective, constraints)
-        prob.solve(verbose=self.verbose)
+        # Update the parameters of the cached problem and solve it
+        prob, cvx_x, cvx_w, cvx_projection = self._cached_probs[y]
+        cvx_w.value = projection.dot(w.reshape(-1))
+        cvx_projection.value = projection
+        prob.solve(warm_start=True, verbose=self.verbose)
 
         # Get the results and project it back to the full space
         x_opt = np.array(cvx_x.value).reshape(-1)
         return x_opt.dot(projection)
+
+    def _build_feasible_set_problem(self, y):
+        """ Build the Parameterized Feasible Set Problem
+
+        Parameters
+        ----------
+        y : int
+            Desired attack point label
+
+        Returns
+        -------
+        prob : cvx.Problem
+            Optimization problem over the projected feasible set
+        cvx_x : cvx.Variable of shape (3,)
+            Attack point in the projected subspace
+        cvx_w : cvx.Parameter of shape (3,)
+            Objective function weights projected to the lower subspace
+        cvx_projection : cvx.Parameter of shape (3, dimensions)
+            Projection matrix down to the lower subspace
+        """
+        d = 3
+        full_d = self.x.shape[1]
+
+        cvx_x = cvx.Variable(d)
+        cvx_w = cvx.Parameter(d)
+        cvx_projection = cvx.Parameter((d, full_d))
+
+        # Get the objective and constraints from the classifier and defense.
+        # The weights are projected before they are set to keep the problem DPP.
+        objective = self.loss_cvx(cvx_x, y=y, w=cvx_w)
+        constraints = self.constraints_cvx(cvx_x, y=y, project=cvx_projection)
+
+        prob = cvx.Problem(objective, constraints)
+        return prob, cvx_x, cvx_w, cvx_projection
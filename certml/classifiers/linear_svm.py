@@ -2,16 +2,15 @@
 
 import numpy as np
 import cvxpy as cvx
-import scipy.sparse as sparse
 from sklearn import svm
 from certml.certify import CertifiableMixin
-from certml.utils.cvx import cvx_dot
+from certml.utils.cvx import cvx_dot, cvx_project
 
 
 class LinearSVM(svm.LinearSVC, CertifiableMixin):
     """Linear Support Vector Machine
     """
-    def __init__(self, upper_params_norm_sq, use_bias, weight_decay=None):
+    def __init__(self, upper_params_norm_sq, use_bias, weight_decay=None, verbose=False):
 
         self._cert_x = None
         self._cert_y = None
@@ -35,7 +34,7 @@ class LinearSVM(svm.LinearSVC, CertifiableMixin):
 
         super(LinearSVM, self).__init__(tol=1e-6, loss='hinge',
                                         fit_intercept=use_bias, random_state=24,
-                                        max_iter=100000, verbose=True)
+                                        max_iter=100000, verbose=verbose)
 
     def fit(self, X, y, sample_weight=None):
         """ Fit the Linear Support Vector Machine
@@ -108,7 +107,9 @@ class LinearSVM(svm.LinearSVC, CertifiableMixin):
             'type': 'classifier',
             'loss': self._cert_loss,
             'loss_grad': self._cert_loss_grad,
+            'loss_and_grad': self._cert_loss_and_grad,
             'loss_cvx': self._cert_loss_cvx,
+            'loss_linear': True,  # Attack objective 1 - y w^T x is linear in x
             'data': {
                 'features': self._cert_x,
                 'labels': self._cert_y
@@ -156,9 +157,9 @@ class LinearSVM(svm.LinearSVC, CertifiableMixin):
         cvx_x
         y : int
             Data label
-        w : np.ndarray of shape (dimensions,)
+        w : np.ndarray or cvx.Parameter of shape (dimensions,)
             Parameters
-        project : np.ndarray of shape ()
+        project : np.ndarray or cvx.Parameter of shape (subspace, dimensions)
 
         Returns
         -------
@@ -166,8 +167,10 @@ class LinearSVM(svm.LinearSVC, CertifiableMixin):
             CVX optimization objective
         """
         if project is not None:
-            w = project.dot(w.reshape(-1))
-        loss_cvx = cvx.Maximize(1 - y * cvx_dot(w.flatten(), cvx_x))
+            w = cvx_project(project, w)
+        elif isinstance(w, np.ndarray):
+            w = w.flatten()
+        loss_cvx = cvx.Maximize(1 - y * cvx_dot(w, cvx_x))
         return loss_cvx
 
     def _cert_loss_grad(self, X, Y, w=None, b=None):
@@ -191,22 +194,59 @@ class LinearSVM(svm.LinearSVC, CertifiableMixin):
         grad_b : float
             Gradient of intercept
         """
+        _, grad_w, grad_b = self._cert_loss_and_grad(X, Y, w=w, b=b)
+        return grad_w, grad_b
+
+    def _cert_loss_and_grad(self, X, Y, w=None, b=None):
+        """ Hinge Loss and its Gradient
+
+        Computes both from a single pass of X.dot(w). Several models can be
+        evaluated at once by stacking their coefficients as the columns of w,
+        which turns the passes over X into matrix products.
+
+        Parameters
+        ----------
+        X : np.ndarray of shape (instances, dimensions)
+            Input Features
+        Y : np.ndarray of shape (instances,)
+            Input Labels
+        w : np.ndarray of shape (dimensions,) or (dimensions, models)
+            Coefficients
+        b : float or np.ndarray of shape (models,)
+            Intercept
+
+        Returns
+        -------
+        loss : float or np.ndarray of shape (models,)
+            Hinge loss
+        grad_w : np.ndarray of shape (dimensions,) or (dimensions, models)
+            Gradient of coefficients
+        grad_b : float or np.ndarray of shape (models,)
+            Gradient of intercept
+        """
         if w is None or b is None:
             w = self.coef_.flatten()
             b = self.intercept_.flatten()
 
-        margins = Y * (X.dot(w) + b).flatten()
-        sv_indicators = margins < 1
-        if sparse.issparse(X):
-            grad_w = np.sum(
-                -sparse.diags(np.reshape(Y[sv_indicators], (-1))).dot(
-                    X[sv_indicators, :]), axis=0) / X.shape[0]
-            grad_w = np.array(grad_w).reshape(-1)
-        else:
-            grad_w = np.sum(
-                -np.reshape(Y[sv_indicators], (-1, 1)) * X[sv_indicators, :],
-                axis=0) / X.shape[0]
+        if np.ndim(w) == 2:
+            Y = Y.reshape(-1, 1)
 
-        grad_b = np.sum(-np.reshape(Y[sv_indicators], (-1, 1))) / X.shape[0]
+        # The output of X.dot(w) is the only (instances,) allocation.
+        # Everything after it is done in place.
+        margins = np.asarray(X.dot(w)).reshape(X.shape[0], *np.shape(w)[1:])
+        margins += b
+        margins *= Y
 
-        return grad_w, grad_b
+        hinge = np.subtract(1, margins, out=margins)
+        np.maximum(hinge, 0, out=hinge)
+        loss = np.mean(hinge, axis=0)
+
+        # Only the support vectors (margin < 1, i.e. hinge > 0) contribute to the
+        # gradient. Weighting every row by its label and doing a single X^T pass
+        # avoids copying the support vector rows out of X (dense or sparse).
+        sv_weights = np.multiply(hinge > 0, Y, out=hinge)
+        grad_w = np.asarray(X.T.dot(sv_weights)).reshape(np.shape(w))
+        grad_w *= -1.0 / X.shape[0]
+        grad_b = -np.sum(sv_weights, axis=0) / X.shape[0]
+
+        return loss, grad_w, grad_b
@@ -0,0 +1,86 @@
+"""Linear SVM Unit Tests"""
+
+import numpy as np
+import pytest
+import scipy.sparse as sparse
+from certml.classifiers import LinearSVM
+
+
+def _make_data(dtype, sparse_format):
+    rng = np.random.RandomState(0)
+    X = rng.randn(60, 8).astype(dtype)
+    X[rng.rand(*X.shape) < 0.5] = 0
+    Y = np.where(rng.rand(60) < 0.5, -1.0, 1.0).astype(dtype)
+    w = rng.randn(8).astype(dtype)
+    if sparse_format:
+        X = sparse.csr_matrix(X)
+    return X, Y, w
+
+
+def _hinge_grad(X, Y, w, b):
+    """Gradient of the hinge loss, one support vector row at a time"""
+    X = X.toarray() if sparse.issparse(X) else X
+    margins = Y * (X.dot(w) + b)
+    sv_indicators = margins < 1
+    grad_w = np.sum(-Y[sv_indicators, None] * X[sv_indicators, :], axis=0) / X.shape[0]
+    grad_b = np.sum(-Y[sv_indicators]) / X.shape[0]
+    return grad_w, grad_b
+
+
+class TestCertLossAndGrad(object):
+    """Fused Hinge Loss and Gradient Unit Tests"""
+
+    @pytest.mark.parametrize('dtype', [np.float32, np.float64])
+    @pytest.mark.parametrize('sparse_format', [False, True])
+    def test_matches_unfused(self, dtype, sparse_format):
+        X, Y, w = _make_data(dtype, sparse_format)
+        b = 0.3
+        svm = LinearSVM(upper_params_norm_sq=1, use_bias=True)
+        rtol = 1e-5 if dtype == np.float32 else 1e-10
+
+        loss, grad_w, grad_b = svm._cert_loss_and_grad(X, Y, w=w, b=b)
+        expected_grad_w, expected_grad_b = _hinge_grad(X, Y, w, b)
+
+        assert np.isclose(loss, svm._cert_loss(X, Y, w=w, b=b), rtol=rtol)
+        assert grad_w.shape == w.shape
+        assert np.allclose(grad_w, expected_grad_w, rtol=rtol, atol=rtol)
+        assert np.isclose(grad_b, expected_grad_b, rtol=rtol)
+
+    @pytest.mark.parametrize('dtype', [np.float32, np.float64])
+    @pytest.mark.parametrize('sparse_format', [False, True])
+    def test_stacked_models(self, dtype, sparse_format):
+        X, Y, w = _make_data(dtype, sparse_format)
+        W = np.stack([w, -w, 2 * w], axis=1)
+        b = np.array([0.3, -0.1, 0.0])
+        svm = LinearSVM(upper_params_norm_sq=1, use_bias=True)
+        rtol = 1e-5 if dtype == np.float32 else 1e-10
+
+        loss, grad_w, grad_b = svm._cert_loss_and_grad(X, Y, w=W, b=b)
+
+        assert loss.shape == (3,)
+        assert grad_w.shape == W.shape
+        for idx in range(3):
+            expected_loss, expected_grad_w, expected_grad_b = svm._cert_loss_and_grad(
+                X, Y, w=W[:, idx], b=b[idx])
+            assert np.isclose(loss[idx], expected_loss, rtol=rtol)
+            assert np.allclose(grad_w[:, idx], expected_grad_w, rtol=rtol, atol=rtol)
+            assert np.isclose(grad_b[idx], expected_grad_b, rtol=rtol)
+
+    def test_cert_loss_grad(self):
+        X, Y, w = _make_data(np.float64, False)
+        svm = LinearSVM(upper_params_norm_sq=1, use_bias=True)
+
+        grad_w, grad_b = svm._cert_loss_grad(X, Y, w=w, b=-0.2)
+        expected_grad_w, expected_grad_b = _hinge_grad(X, Y, w, -0.2)
+
+        assert np.allclose(grad_w, expected_grad_w)
+        assert np.isclose(grad_b, expected_grad_b)
+
+    def test_inputs_unchanged(self):
+        X, Y, w = _make_data(np.float64, False)
+        X_copy, Y_copy, w_copy = X.copy(), Y.copy(), w.copy()
+        LinearSVM(upper_params_norm_sq=1, use_bias=True)._cert_loss_and_grad(X, Y, w=w, b=0.1)
+
+        assert np.array_equal(X, X_copy)
+        assert np.array_equal(Y, Y_copy)
+        assert np.array_equal(w, w_copy)
@@ -6,7 +6,7 @@ from certml.utils.data import generate_class_map, get_centroids, \
 from certml.defenses import BaseDefense
 from certml.certify import CertifiableMixin
 import cvxpy as cvx
-from certml.utils.cvx import cvx_dot
+from certml.utils.cvx import cvx_dot, cvx_project
 
 
 class DataOracle(BaseDefense, CertifiableMixin):
@@ -76,28 +76,44 @@ class DataOracle(BaseDefense, CertifiableMixin):
             Filtered input labels
         """
         if y is not None:  # Training
-            if self.mode is 'sphere':
-                sphere_radii = self.radii
-                slab_radii = np.full(self.radii.shape, np.inf)
-            elif self.mode is 'slab':
-                sphere_radii = np.full(self.radii.shape, np.inf)
-                slab_radii = self.radii
-            else:
-                raise ValueError('Invalid mode!')
+            sphere_radii, slab_radii = self._get_sphere_slab_radii()
             x_transformed, y_transformed = filter_points_outside_feasible_set(
                 X, y, self.centroids, self.centroid_vec, sphere_radii, slab_radii, self.class_map)
             return x_transformed, y_transformed
         else:  # Testing
             return X
 
+    def _get_sphere_slab_radii(self):
+        """ Get Sphere and Slab Radii for the Current Mode
+
+        Returns
+        -------
+        sphere_radii : np.ndarray of shape (classes,)
+            Sphere radius for each class (inf if unused)
+        slab_radii : np.ndarray of shape (classes,)
+            Slab radius for each class (inf if unused)
+        """
+        if self.mode == 'sphere':
+            sphere_radii = self.radii
+            slab_radii = np.full(self.radii.shape, np.inf)
+        elif self.mode == 'slab':
+            sphere_radii = np.full(self.radii.shape, np.inf)
+            slab_radii = self.radii
+        else:
+            raise ValueError('Invalid mode!')
+        return sphere_radii, slab_radii
+
     def cert_params(self):
+        sphere_radii, slab_radii = self._get_sphere_slab_radii()
         params = {
             'type': 'defense',
             'constraints_cvx': self._cert_constraints_cvx,
             'data': {
                 'class_map': self.class_map,
                 'centroids': self.centroids,
-                'centroid_vec': self.centroid_vec
+                'centroid_vec': self.centroid_vec,
+                'sphere_radii': sphere_radii,
+                'slab_radii': slab_radii
             }
         }
         return params
@@ -108,16 +124,20 @@ class DataOracle(BaseDefense, CertifiableMixin):
 
         cent = self.centroids[y_ind, :]
         cent_vec = self.centroid_vec
-        if project is not None:
-            cent = project.dot(cent.reshape(-1))
-            cent_vec = project.dot(cent_vec.reshape(-1))
 
-        cvx_x_c = cvx_x - cent
+        # <c_vec, c> is computed before projecting. The projection spans both
+        # vectors, so it is unchanged, and the slab constraint stays affine in
+        # the projection parameter (DPP).
+        slab_offset = float(np.dot(cent_vec.reshape(-1), cent.reshape(-1)))
+
+        if project is not None:
+            cent = cvx_project(project, cent)
+            cent_vec = cvx_project(project, cent_vec)
 
         if self.mode is 'sphere':
-            constraints_cvx.append(cvx.norm(cvx_x_c, 2) < self.radii[y_ind])
+            constraints_cvx.append(cvx.norm(cvx_x - cent, 2) <= self.radii[y_ind])
         elif self.mode is 'slab':
-            constraints_cvx.append(cvx.abs(cvx_dot(cent_vec, cvx_x_c)) < self.radii[y_ind])
+            constraints_cvx.append(cvx.abs(cvx_dot(cent_vec, cvx_x) - slab_offset) <= self.radii[y_ind])
         else:
             raise ValueError('Invalid mode type')
 
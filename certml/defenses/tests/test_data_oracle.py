@@ -0,0 +1,30 @@
+"""Data Oracle Unit Tests"""
+
+import numpy as np
+from certml.defenses import DataOracle
+from certml.utils.data import minimize_linear_over_feasible_set
+
+
+class TestDataOracle(object):
+    """Data Oracle Unit Tests"""
+
+    def test_accepts_closed_form_attack_points(self):
+        rng = np.random.RandomState(0)
+        X = rng.normal(size=(200, 20)) + 10 * rng.normal(size=(1, 20))
+        y = np.where(rng.uniform(size=200) > 0.5, 1, -1)
+        X[y == 1, :] += 3.0
+
+        oracle = DataOracle(mode='sphere', radius=4.0)
+        oracle.fit_trusted(X, y)
+        data = oracle.cert_params()['data']
+
+        X_attack = np.zeros((500, 20))
+        y_attack = np.where(rng.uniform(size=500) > 0.5, 1, -1)
+        for idx, y_b in enumerate(y_attack):
+            y_ind = data['class_map'][y_b]
+            X_attack[idx, :] = minimize_linear_over_feasible_set(
+                rng.normal(size=20), data['centroids'][y_ind, :], data['centroid_vec'],
+                data['sphere_radii'][y_ind], data['slab_radii'][y_ind])
+
+        X_kept, y_kept = oracle.transform(X_attack, y_attack)
+        assert X_kept.shape[0] == X_attack.shape[0]
@@ -167,9 +167,7 @@ def get_data_params(X, Y, percentile):
     slab_radii : float
         Radius of slab defense so the percentile criteria is met
     """
-    num_classes = len(set(Y))
-    num_features = X.shape[1]
-    centroids = np.zeros((num_classes, num_features))
+    classes = np.unique(Y)
     class_map = get_class_map()
     centroids = get_centroids(X, Y, class_map)
 
@@ -181,7 +179,7 @@ def get_data_params(X, Y, percentile):
         centroids=centroids,
         class_map=class_map,    
         norm=2)
-    for y in set(Y):            
+    for y in classes:
         sphere_radii[class_map[y]] = np.percentile(dists[Y == y], percentile)
 
     # Get vector between centroids
@@ -189,7 +187,7 @@ def get_data_params(X, Y, percentile):
 
     # Get radii for slab
     slab_radii = np.zeros(2)
-    for y in set(Y):            
+    for y in classes:
         dists = np.abs( 
             (X[Y == y, :].dot(centroid_vec.T) - centroids[class_map[y], :].dot(centroid_vec.T)))            
         slab_radii[class_map[y]] = np.percentile(dists, percentile)
@@ -292,14 +290,16 @@ def threshold(X):
 
     Parameters
     ----------
-    X : np.ndarray of shape (instances, dimensions)
+    X : np.ndarray or scipy.sparse matrix of shape (instances, dimensions)
         Input features
 
     Returns
     -------
-    X_clip : np.ndarray of shape (instances, dimensions)
-        Clipped input features
+    X_clip : np.ndarray or scipy.sparse.csr_matrix of shape (instances, dimensions)
+        Clipped input features, sparse if X is sparse
     """
+    if sparse.issparse(X):
+        return sparse.csr_matrix(X.maximum(0))
     return np.clip(X, 0, np.max(X))
 
 
@@ -313,15 +313,23 @@ def rround(X, random_seed=3):
 
     Parameters
     ----------
-    X : np.ndarray of shape (instances, dimensions)
+    X : np.ndarray or scipy.sparse matrix of shape (instances, dimensions)
         Input features
     random_seed : int
         Numpy random seed
 
     Returns
     -------
-    X_rround : np.ndarray of shape (instances, dimensions)
+    X_rround : np.ndarray or scipy.sparse.csr_matrix of shape (instances, dimensions)
+        Rounded input features, sparse if X is sparse
     """
+    # Zeros are never rounded up, so only the stored values need rounding
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X, dtype=float, copy=True)
+        X.data = rround(X.data, random_seed)
+        X.eliminate_zeros()
+        return X
+
     X_frac, X_int = np.modf(X)
     X = X_int + (np.random.random_sample(X.shape) < X_frac)
     return X
@@ -54,18 +54,17 @@ slab_dists_flip = defenses.compute_dists_under_Q(
 # Determine Which Data is Within the Feasible Set #
 ###################################################
 
+# Dense lookup from labels to class indices, so the radii
+# can be gathered for every point at once
+class_map_labels = np.array(sorted(class_map))
+class_map_idx = np.array([class_map[y] for y in class_map_labels])
+class_idx_flip = class_map_idx[np.searchsorted(class_map_labels, -Y_train)]
+
 # We should only flip data within the feasible set
 # as data outside will be removed by the defense and have no impact
-feasible_flipped_mask = np.zeros(X_train.shape[0], dtype=bool)
-
-for y in set(Y_train):
-    class_idx_flip = class_map[-y]
-    sphere_radius_flip = sphere_radii[class_idx_flip]
-    slab_radius_flip = slab_radii[class_idx_flip]
-    
-    feasible_flipped_mask[Y_train == y] = (
-        (sphere_dists_flip[Y_train == y] <= sphere_radius_flip) & 
-        (slab_dists_flip[Y_train == y] <= slab_radius_flip))
+feasible_flipped_mask = (
+    (sphere_dists_flip <= sphere_radii[class_idx_flip]) &
+    (slab_dists_flip <= slab_radii[class_idx_flip]))
 
 print('Num positive points: %s' % np.sum(Y_train == 1))
 print('Num negative points: %s' % np.sum(Y_train == -1))
@@ -75,6 +74,9 @@ print('Fraction of feasible negative points that can be flipped: %s' % np.mean(f
 ##############################################
 # Generate Poisoned Dataset for Each Epsilon #
 ##############################################
+feasible_idx = np.flatnonzero(feasible_flipped_mask)
+rng = np.random.RandomState(random_seed)
+
 for epsilon in epsilons:
     if epsilon == 0:
         continue
@@ -83,16 +85,16 @@ for epsilon in epsilons:
     num_copies = int(np.round(epsilon * X_train.shape[0]))
 
     # Randomly determine which instances to flip
-    idx_to_copy = np.random.choice(
-        np.where(feasible_flipped_mask)[0],
-        size=num_copies,
-        replace=True)
+    idx_to_copy = feasible_idx[rng.randint(0, feasible_idx.size, size=num_copies)]
 
     # Flip labels of instances
     if sparse.issparse(X_train):
-        X_modified = sparse.vstack((X_train, X_train[idx_to_copy, :]))
+        X_modified = sparse.vstack((X_train, X_train[idx_to_copy, :]), format='csr')
     else:
-        X_modified = np.append(X_train, X_train[idx_to_copy, :], axis=0)
+        # Write into a preallocated buffer rather than appending to avoid a temporary copy
+        X_modified = np.empty((X_train.shape[0] + num_copies, X_train.shape[1]), dtype=X_train.dtype)
+        X_modified[:X_train.shape[0], :] = X_train
+        np.take(X_train, idx_to_copy, axis=0, out=X_modified[X_train.shape[0]:, :])
     Y_modified = np.append(Y_train, -Y_train[idx_to_copy])
 
     ################
@@ -101,33 +103,33 @@ for epsilon in epsilons:
 
     # Just to make sure nothing went wrong. Calculate the percentage
     # attack instances that are within the feasible set. This should be 100%.
-    sphere_dists = defenses.compute_dists_under_Q(    
-        X_modified, Y_modified,
+    # Only the appended attack rows are checked, as saved.
+    X_poison = X_modified[X_train.shape[0]:, :]
+    Y_poison = Y_modified[X_train.shape[0]:]
+
+    sphere_dists = defenses.compute_dists_under_Q(
+        X_poison, Y_poison,
         Q=None,
         subtract_from_l2=False,
         centroids=centroids,
-        class_map=class_map,    
-        norm=2)    
-    slab_dists = defenses.compute_dists_under_Q(    
-        X_modified, Y_modified,
+        class_map=class_map,
+        norm=2)
+
+    slab_dists = defenses.compute_dists_under_Q(
+        X_poison, Y_poison,
         Q=centroid_vec,
         subtract_from_l2=False,
         centroids=centroids,
-        class_map=class_map,    
-        norm=2)    
+        class_map=class_map,
+        norm=2)
 
-    feasible_mask = np.zeros(X_modified.shape[0], dtype=bool)
+    class_idx = class_map_idx[np.searchsorted(class_map_labels, Y_poison)]
 
-    for y in set(Y_modified):
-        class_idx = class_map[y]
-        sphere_radius = sphere_radii[class_idx]
-        slab_radius = slab_radii[class_idx]
-        
-        feasible_mask[Y_modified == y] = (
-            (sphere_dists[Y_modified == y] <= sphere_radius) & 
-            (slab_dists[Y_modified == y] <= slab_radius))
+    feasible_mask = (
+        (sphere_dists <= sphere_radii[class_idx]) &
+        (slab_dists <= slab_radii[class_idx]))
 
-    print('Fraction of feasible points in attack: %s' % np.mean(feasible_mask[X_train.shape[0]:]))
+    print('Fraction of feasible points in attack: %s' % np.mean(feasible_mask))
 
     # Save Poisoned Dataset
     np.savez(
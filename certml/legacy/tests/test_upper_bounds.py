@@ -0,0 +1,200 @@
+"""Legacy Upper Bounds Unit Tests"""
+
+import numpy as np
+import pytest
+import scipy.sparse as sparse
+from certml.legacy.upper_bounds import hinge_loss, hinge_grad, hinge_loss_and_grad, \
+    get_label_scaled_features, svm_with_rho_squared, Minimizer, sample_lower_bound_attack, \
+    generate_upper_and_lower_bounds
+from certml.legacy import data_utils
+from certml.utils.data import filter_points_outside_feasible_set
+
+
+def _make_data(dtype, sparse_format):
+    rng = np.random.RandomState(0)
+    X = rng.randn(60, 8).astype(dtype)
+    X[rng.rand(*X.shape) < 0.5] = 0
+    Y = np.where(rng.rand(60) < 0.5, -1, 1)
+    w = rng.randn(8).astype(dtype)
+    if sparse_format:
+        X = sparse.csr_matrix(X)
+    return X, Y, w
+
+
+def _rtol(dtype):
+    return 1e-5 if dtype == np.float32 else 1e-10
+
+
+class TestHingeGrad(object):
+    """Hinge Gradient Unit Tests"""
+
+    @pytest.mark.parametrize('dtype', [np.float32, np.float64])
+    @pytest.mark.parametrize('sparse_format', [False, True])
+    def test_matches_row_by_row(self, dtype, sparse_format):
+        X, Y, w = _make_data(dtype, sparse_format)
+        X_dense = X.toarray() if sparse_format else X
+        sv_indicators = Y * (X_dense.dot(w) + 0.3) < 1
+        expected = np.sum(-Y[sv_indicators, None] * X_dense[sv_indicators, :], axis=0) / X.shape[0]
+
+        grad_w, grad_b = hinge_grad(w, 0.3, X, Y)
+
+        assert np.allclose(grad_w, expected, rtol=_rtol(dtype), atol=_rtol(dtype))
+        assert np.isclose(grad_b, -np.sum(Y[sv_indicators]) / X.shape[0])
+
+    def test_out_grad_w(self):
+        X, Y, w = _make_data(np.float64, False)
+        out_grad_w = np.empty_like(w)
+
+        grad_w, grad_b = hinge_grad(w, 0.3, X, Y, out_grad_w=out_grad_w)
+
+        assert grad_w is out_grad_w
+        assert np.allclose(grad_w, hinge_grad(w, 0.3, X, Y)[0])
+
+
+class TestHingeLossAndGrad(object):
+    """Fused Hinge Loss and Gradient Unit Tests"""
+
+    @pytest.mark.parametrize('dtype', [np.float32, np.float64])
+    @pytest.mark.parametrize('sparse_format', [False, True])
+    @pytest.mark.parametrize('label_scaled', [False, True])
+    @pytest.mark.parametrize('buffers', [False, True])
+    def test_matches_unfused(self, dtype, sparse_format, label_scaled, buffers):
+        X, Y, w = _make_data(dtype, sparse_format)
+        b = 0.3
+        YX = get_label_scaled_features(X, Y) if label_scaled else None
+        out_grad_w = np.empty(X.shape[1], dtype=dtype) if buffers else None
+        out_margins = np.empty(X.shape[0], dtype=dtype) if buffers else None
+
+        loss, grad_w, grad_b, margins = hinge_loss_and_grad(
+            w, b, X, Y, YX=YX, out_grad_w=out_grad_w, out_margins=out_margins)
+        expected_grad_w, expected_grad_b = hinge_grad(w, b, X, Y)
+
+        rtol = _rtol(dtype)
+        assert np.isclose(loss, hinge_loss(w, b, X, Y), rtol=rtol)
+        assert grad_w.shape == w.shape
+        assert np.allclose(grad_w, expected_grad_w, rtol=rtol, atol=rtol)
+        assert np.isclose(grad_b, expected_grad_b, rtol=rtol)
+        assert np.allclose(margins, Y * (X.dot(w) + b), rtol=rtol, atol=rtol)
+        if buffers:
+            assert grad_w is out_grad_w
+            if label_scaled:
+                assert margins is out_margins
+
+    def test_label_scaled_features(self):
+        X, Y, _ = _make_data(np.float32, True)
+        YX = get_label_scaled_features(X, Y)
+
+        assert sparse.isspmatrix_csr(YX)
+        assert YX.dtype == np.float32
+        assert np.allclose(YX.toarray(), Y[:, None] * X.toarray())
+
+
+class TestSVMWithRhoSquared(object):
+    """Weight Decay Search Unit Tests"""
+
+    @pytest.mark.parametrize('upper_params_norm_sq', [0.5, 5.0])
+    def test_reaches_target(self, upper_params_norm_sq, capsys):
+        rng = np.random.RandomState(0)
+        X = rng.randn(200, 5)
+        Y = np.sign(X[:, 0] + 0.5 * rng.randn(200))
+
+        result = svm_with_rho_squared(X, Y, X, Y, upper_params_norm_sq, True)
+        params_norm_sq = result[4]
+
+        assert upper_params_norm_sq <= params_norm_sq <= upper_params_norm_sq + 0.01
+        assert 'Warning' not in capsys.readouterr().out
+
+    def test_refits_tightly_at_lower_bound(self, capsys):
+        rng = np.random.RandomState(0)
+        X = rng.randn(200, 5)
+        Y = np.sign(X[:, 0] + 0.5 * rng.randn(200))
+
+        # Unreachable, so the search gives up at the lower weight decay bound
+        result = svm_with_rho_squared(X, Y, X, Y, 1e6, True)
+
+        assert result[8].tol == 1e-6
+        assert 'Warning: params norm sq' in capsys.readouterr().out
+
+
+class TestMinimizer(object):
+    """Minimizer Unit Tests"""
+
+    @pytest.mark.parametrize('use_slab', [False, True])
+    def test_strictly_feasible(self, use_slab):
+        rng = np.random.RandomState(0)
+        centroids = 100 * rng.normal(size=(2, 10))
+        centroid_vec = (centroids[0, :] - centroids[1, :]).reshape(1, -1)
+        centroid_vec /= np.linalg.norm(centroid_vec)
+        sphere_radii = np.array([3.0, 5.0])
+        slab_radii = np.array([1.0, 2.0]) if use_slab else np.array([np.inf, np.inf])
+        class_map = {-1: 0, 1: 1}
+        minimizer = Minimizer(use_sphere=True, use_slab=use_slab)
+
+        Y = np.where(rng.uniform(size=300) > 0.5, 1, -1)
+        X = np.array([
+            minimizer.minimize_over_feasible_set(
+                y, rng.normal(size=10).astype(np.float32), centroids[class_map[y], :],
+                centroid_vec, sphere_radii[class_map[y]], slab_radii[class_map[y]])
+            for y in Y])
+
+        X_kept, _ = filter_points_outside_feasible_set(
+            X, Y, centroids, centroid_vec, sphere_radii, slab_radii, class_map)
+        assert X_kept.shape[0] == X.shape[0]
+
+
+class TestSampleLowerBoundAttack(object):
+    """Lower Bound Attack Sampling Unit Tests"""
+
+    def test_sparse_integer_attack(self):
+        rng = np.random.RandomState(0)
+        X_train = sparse.random(40, 8, density=0.3, format='csr', random_state=rng)
+        Y_train = np.where(rng.rand(40) < 0.5, -1, 1)
+        x_bs = 3 * rng.randn(20, 8)
+        y_bs = np.where(rng.rand(20) < 0.5, -1, 1)
+
+        X_modified, Y_modified, idx_train, idx_poison = sample_lower_bound_attack(
+            X_train, Y_train, x_bs, y_bs, 0.25, 5)
+        assert sparse.isspmatrix_csr(X_modified)
+        assert X_modified.shape == (50, 8)
+
+        # Randomized rounding of the poisoned points, as done for IMDB
+        X_poison = data_utils.rround(data_utils.threshold(X_modified[idx_poison, :]))
+        X_rounded = sparse.vstack((X_train, sparse.csr_matrix(X_poison)))
+
+        assert sparse.issparse(X_poison)
+        assert X_rounded.shape == (50, 8)
+        assert np.all(X_poison.data > 0)
+        assert np.all(X_poison.data == np.round(X_poison.data))
+        X_poison_clipped = np.maximum(X_modified[idx_poison, :].toarray(), 0)
+        assert np.all(np.abs(X_poison.toarray() - X_poison_clipped) < 1)
+
+
+class TestGenerateUpperAndLowerBounds(object):
+    """Upper and Lower Bounds Unit Tests"""
+
+    @pytest.mark.parametrize('dtype', [np.float32, np.float64])
+    def test_attack_points_feasible(self, dtype):
+        rng = np.random.RandomState(0)
+        Y = np.where(rng.rand(200) < 0.5, -1, 1)
+        X = rng.randn(200, 6)
+        X[:, 0] += Y
+        class_map = {-1: 0, 1: 1}
+        centroids = np.array([X[Y == -1].mean(axis=0), X[Y == 1].mean(axis=0)])
+        centroid_vec = (centroids[1, :] - centroids[0, :]).reshape(1, -1)
+        centroid_vec /= np.linalg.norm(centroid_vec)
+        sphere_radii = np.array([2.0, 2.0])
+        slab_radii = np.array([0.5, 0.5])
+
+        # numpy scalars must not promote the model out of the working dtype
+        result = generate_upper_and_lower_bounds(
+            X, Y, 1.0, np.float64(0.1), 100, 10, np.float64(0.1), np.zeros(6), np.float64(0.0),
+            class_map, centroids, centroid_vec, sphere_radii, slab_radii, Minimizer(),
+            verbose=False, dtype=dtype)
+        X_modified, Y_modified, idx_train, idx_poison = result[:4]
+        assert np.array_equal(X_modified[idx_train, :], X)
+
+        X_kept, _ = filter_points_outside_feasible_set(
+            X_modified[idx_poison, :], Y_modified[idx_poison], centroids, centroid_vec,
+            sphere_radii, slab_radii, class_map)
+        assert X_kept.shape[0] == 20
+        assert np.isfinite(result[4])
@@ -1,10 +1,13 @@
 """Determine Upper Bounds"""
 
 import numpy as np
-from scipy.linalg import orth
 import scipy.sparse as sparse
 from sklearn import svm
 import cvxpy as cvx
+from certml.utils.data import get_projection_matrix, minimize_linear_over_feasible_set, \
+    sample_without_replacement
+# The CVX finders were migrated to certml.utils.cvx and are re-exported here
+from certml.utils.cvx import NearestPointFinder, Projector  # noqa: F401
 
 
 # Migrated
@@ -31,15 +34,21 @@ def hinge_loss(w, b, X, Y, sample_weights=None):
     loss : float
         Hinge loss
     """
+    # The output of X.dot(w) is the only allocation, everything else is in place
+    losses = np.asarray(X.dot(w), dtype=float)
+    losses += b
+    losses *= Y
+    np.subtract(1.0, losses, out=losses)
+    np.maximum(losses, 0.0, out=losses)
+
     if sample_weights is not None:
-        sample_weights = sample_weights / np.sum(sample_weights)
-        return np.sum(sample_weights * (np.maximum(1 - Y * (X.dot(w) + b), 0)))
+        return np.dot(sample_weights, losses) / np.sum(sample_weights)
     else:
-        return np.mean(np.maximum(1 - Y * (X.dot(w) + b), 0))
+        return losses.mean()
 
 
 # Migrated
-def hinge_grad(w, b, X, Y):
+def hinge_grad(w, b, X, Y, out_grad_w=None):
     """ Gradient of Hinge Loss
 
     Parameters
@@ -52,6 +61,8 @@ def hinge_grad(w, b, X, Y):
         Input Features
     Y : np.ndarray of shape (instances,)
         Input Labels
+    out_grad_w : np.ndarray of shape (dimensions,), optional
+        Buffer to write the gradient of the coefficients into
 
     Returns
     -------
@@ -62,21 +73,124 @@ def hinge_grad(w, b, X, Y):
     """
     margins = Y * (X.dot(w) + b)
     sv_indicators = margins < 1
-    if sparse.issparse(X):
-        grad_w = np.sum( 
-            -sparse.diags(np.reshape(Y[sv_indicators], (-1))).dot(
-                X[sv_indicators, :]) , axis=0) / X.shape[0]
-        grad_w = np.array(grad_w).reshape(-1)    
-    else:
-        grad_w = np.sum( 
-            -np.reshape(Y[sv_indicators], (-1, 1)) * X[sv_indicators, :],
-             axis=0) / X.shape[0]
+    # One X^T pass with the support vectors weighted by -y (and everything
+    # else by 0), instead of gathering and scaling the support vector rows.
+    # For sparse X this is a single O(nnz) product without building a
+    # diagonal matrix or a new sparse matrix.
+    grad_w = np.asarray(X.T.dot(-Y * sv_indicators)).reshape(-1)
+    grad_w = np.divide(grad_w, X.shape[0], out=out_grad_w)
     
     grad_b = np.sum( -np.reshape(Y[sv_indicators], (-1, 1))) / X.shape[0]
     
     return grad_w, grad_b
 
 
+def hinge_loss_and_grad(w, b, X, Y, YX=None, out_grad_w=None, out_margins=None):
+    """ Hinge Loss and its Gradient
+
+    Computes both from a single pass of X.dot(w). The margins from that pass
+    are returned as well so callers can reuse them (e.g. for accuracy).
+
+    Parameters
+    ----------
+    w : np.ndarray of shape (dimensions,)
+        Coefficients
+    b : float
+        Intercept
+    X : np.ndarray of shape (instances, dimensions)
+        Input Features
+    Y : np.ndarray of shape (instances,)
+        Input Labels
+    YX : np.ndarray or scipy.sparse.csr_matrix of shape (instances, dimensions), optional
+        Input features with each row scaled by its label. Precompute with
+        get_label_scaled_features when calling this repeatedly on the same data.
+    out_grad_w : np.ndarray of shape (dimensions,), optional
+        Buffer to write the gradient of the coefficients into. With a dense YX
+        it must have the dtype of YX.
+    out_margins : np.ndarray of shape (instances,), optional
+        Buffer to write the margins into. With a dense YX it must have the
+        dtype of YX, as must w.
+
+    Returns
+    -------
+    loss : float
+        Hinge loss
+    grad_w : np.ndarray of shape (dimensions,)
+        Gradient of coefficients
+    grad_b : float
+        Gradient of intercept
+    margins : np.ndarray of shape (instances,)
+        Margins Y * (X.dot(w) + b)
+    """
+    if YX is None:
+        scores = X.dot(w)
+        scores += b
+        margins = Y * scores
+        sv_indicators = margins < 1
+
+        loss = np.mean(np.maximum(1 - margins, 0))
+
+        sv_weights = -Y * sv_indicators
+        grad_w = np.asarray(X.T.dot(sv_weights)).reshape(-1)
+        grad_w = np.divide(grad_w, X.shape[0], out=out_grad_w)
+        grad_b = np.sum(sv_weights) / X.shape[0]
+    else:
+        dense = not sparse.issparse(YX)
+
+        # Dense products are written straight into the buffers, sparse
+        # products are copied into them
+        if dense and out_margins is not None:
+            margins = np.dot(YX, w, out=out_margins)
+        else:
+            margins = np.asarray(YX.dot(w)).reshape(-1)
+            if out_margins is not None:
+                out_margins[:] = margins
+                margins = out_margins
+        margins += b * Y
+
+        # Every reduction below is a BLAS dot product with the 0/1 support
+        # vector indicator. It has the dtype of YX so float32 data is not
+        # upcast (and copied) by the product.
+        hinge = 1 - margins
+        sv_indicators = (hinge > 0).astype(YX.dtype)
+
+        loss = hinge.dot(sv_indicators) / X.shape[0]
+
+        if dense and out_grad_w is not None:
+            grad_w = np.dot(sv_indicators, YX, out=out_grad_w)
+        else:
+            grad_w = np.asarray(YX.T.dot(sv_indicators)).reshape(-1)
+            if out_grad_w is not None:
+                out_grad_w[:] = grad_w
+                grad_w = out_grad_w
+        grad_w *= -1.0 / X.shape[0]
+        grad_b = -Y.dot(sv_indicators) / X.shape[0]
+
+    return loss, grad_w, grad_b, margins
+
+
+def get_label_scaled_features(X, Y):
+    """ Scale Each Row of the Features by its Label
+
+    Parameters
+    ----------
+    X : np.ndarray or scipy.sparse matrix of shape (instances, dimensions)
+        Input Features
+    Y : np.ndarray of shape (instances,)
+        Input Labels
+
+    Returns
+    -------
+    YX : np.ndarray or scipy.sparse.csr_matrix of shape (instances, dimensions)
+        Y[:, None] * X, sparse if X is sparse
+    """
+    # Labels are cast to the feature dtype so integer labels do not upcast YX
+    Y = Y.astype(X.dtype).reshape(-1, 1)
+    if sparse.issparse(X):
+        return sparse.csr_matrix(X.multiply(Y))
+    return Y * X
+
+
 def sample_lower_bound_attack(X_train, Y_train, x_bs, y_bs, epsilon, num_iter_to_throw_out):
     """ Create Poisoned Dataset from Pool of Malicious Data
 
@@ -99,8 +213,8 @@ def sample_lower_bound_attack(X_train, Y_train, x_bs, y_bs, epsilon, num_iter_to
 
     Returns
     -------
-    X_modified : np.ndarray of shape (instances, dimensions)
-        Poisoned features
+    X_modified : np.ndarray or scipy.sparse.csr_matrix of shape (instances, dimensions)
+        Poisoned features, sparse if X_train is sparse
     Y_modified : no.ndarray of shape (instances,)
         Poisoned labels
     idx_train : np.ndarray of shape (instances,)
@@ -111,13 +225,14 @@ def sample_lower_bound_attack(X_train, Y_train, x_bs, y_bs, epsilon, num_iter_to
     assert x_bs.shape[0] == y_bs.shape[0]
     num_iter = x_bs.shape[0] - num_iter_to_throw_out
 
-    idx_to_sample = np.random.choice(
-        num_iter, 
-        size=int(np.round(epsilon * X_train.shape[0])),
-        replace=False) + num_iter_to_throw_out
+    idx_to_sample = sample_without_replacement(
+        num_iter,
+        int(np.round(epsilon * X_train.shape[0]))) + num_iter_to_throw_out
 
     if sparse.issparse(X_train):
-        X_modified = np.concatenate((X_train.toarray(), x_bs[idx_to_sample, :]), axis=0)
+        X_modified = sparse.vstack(
+            (X_train, sparse.csr_matrix(x_bs[idx_to_sample, :])),
+            format='csr')
     else:
         X_modified = np.concatenate((X_train, x_bs[idx_to_sample, :]), axis=0)
 
@@ -130,8 +245,53 @@ def sample_lower_bound_attack(X_train, Y_train, x_bs, y_bs, epsilon, num_iter_to
 
 
 # Migrated
+def _fit_svm(X_train, Y_train, weight_decay, use_bias, svm_tol, verbose):
+    """ Fit a Support Vector Machine with a Particular Weight Decay
+
+    Parameters
+    ----------
+    X_train : np.ndarray of shape (instances, dimensions)
+        Input training features
+    Y_train : np.ndarray of shape (instances,)
+        Input training labels
+    weight_decay : float
+    use_bias : bool
+    svm_tol : float
+        liblinear stopping tolerance
+    verbose : bool
+        liblinear verbose output
+
+    Returns
+    -------
+    svm_model : sklearn.svm.LinearSVC
+        Trained Support Vector Machine model
+    params : np.ndarray of shape (dimensions,)
+        Fit coefficients
+    bias : float
+        Fit intercept
+    params_norm_sq : float
+        Squared norm of the coefficients and intercept
+    """
+    C = 1.0 / (X_train.shape[0] * weight_decay)
+    svm_model = svm.LinearSVC(
+        C=C,
+        tol=svm_tol,
+        loss='hinge',
+        fit_intercept=use_bias,
+        random_state=24,
+        max_iter=100000,
+        verbose=verbose)
+    svm_model.fit(X_train, Y_train)
+
+    params = np.reshape(svm_model.coef_, -1)
+    bias = svm_model.intercept_[0]
+    params_norm_sq = np.linalg.norm(params)**2 + bias**2
+
+    return svm_model, params, bias, params_norm_sq
+
+
 def svm_with_rho_squared(X_train, Y_train, X_test, Y_test, upper_params_norm_sq, use_bias, 
-                         weight_decay=None):
+                         weight_decay=None, verbose=False):
     """ Train Support Vector Machine
 
     Trains an SVM that has params with squared norm roughly equals (and no larger) than
@@ -150,6 +310,8 @@ def svm_with_rho_squared(X_train, Y_train, X_test, Y_test, upper_params_norm_sq,
     upper_params_norm_sq : ???
     use_bias : ???
     weight_decay : float
+    verbose : bool
+        liblinear verbose output (slows down each fit)
 
     Returns
     -------
@@ -187,6 +349,18 @@ def svm_with_rho_squared(X_train, Y_train, X_test, Y_test, upper_params_norm_sq,
     upper_weight_decay = upper_wd_bound
     weight_decay = (upper_weight_decay + lower_weight_decay) / 2
 
+    # Fit loosely while the binary search is far from the target and only use
+    # the final tolerance once it is close. If there is no target, there is no search.
+    final_svm_tol = 1e-6
+    if upper_params_norm_sq is None:
+        svm_tol = final_svm_tol
+    else:
+        svm_tol = 1e-3
+
+    # Relative width of the weight_decay bracket below which further bisection
+    # can no longer change the fit
+    wd_rtol = 1e-6
+
     while (
       (params_norm_sq is None) or 
       (upper_params_norm_sq > params_norm_sq) or 
@@ -194,25 +368,20 @@ def svm_with_rho_squared(X_train, Y_train, X_test, Y_test, upper_params_norm_sq,
 
         print('Trying weight_decay %s..' % weight_decay)
 
-        C = 1.0 / (X_train.shape[0] * weight_decay)        
-        svm_model = svm.LinearSVC(
-            C=C,
-            tol=1e-6,
-            loss='hinge',
-            fit_intercept=use_bias,
-            random_state=24,
-            max_iter=100000,
-            verbose=True)
-        svm_model.fit(X_train, Y_train)
-
-        params = np.reshape(svm_model.coef_, -1)
-        bias = svm_model.intercept_[0]
-        params_norm_sq = np.linalg.norm(params)**2 + bias**2
+        svm_model, params, bias, params_norm_sq = _fit_svm(
+            X_train, Y_train, weight_decay, use_bias, svm_tol, verbose)
 
         if upper_params_norm_sq is None:
             break
 
         print('Current params norm sq = %s. Target = %s.' % (params_norm_sq, upper_params_norm_sq))
+
+        # Close to the target, so refit this weight_decay with the final tolerance
+        if svm_tol > final_svm_tol and np.abs(upper_params_norm_sq - params_norm_sq) < 10 * rho_sq_tol:
+            svm_tol = final_svm_tol
+            params_norm_sq = None
+            continue
+
         # Current params are too small; need to make them bigger
         # So we should reduce weight_decay
         if upper_params_norm_sq > params_norm_sq:
@@ -233,11 +402,28 @@ def svm_with_rho_squared(X_train, Y_train, X_test, Y_test, upper_params_norm_sq,
                 upper_wd_bound *= 2
                 upper_weight_decay *= 2       
 
+        # Further bisection cannot change the fit once the bracket has collapsed
+        if upper_weight_decay - lower_weight_decay < wd_rtol * weight_decay:
+            print('Weight decay bracket collapsed, breaking')
+            break
+
         if (
           (upper_params_norm_sq > params_norm_sq) or 
           (np.abs(upper_params_norm_sq - params_norm_sq) > rho_sq_tol)):
             weight_decay = (upper_weight_decay + lower_weight_decay) / 2
 
+    # The search can stop early while still fitting loosely
+    if svm_tol > final_svm_tol:
+        svm_model, params, bias, params_norm_sq = _fit_svm(
+            X_train, Y_train, weight_decay, use_bias, final_svm_tol, verbose)
+
+    # The bracket was narrowed using loose fits, so check the final tight fit
+    if (upper_params_norm_sq is not None) and (
+      (upper_params_norm_sq > params_norm_sq) or
+      (np.abs(upper_params_norm_sq - params_norm_sq) > rho_sq_tol)):
+        print('Warning: params norm sq = %s is not within %s of the target %s' % (
+            params_norm_sq, rho_sq_tol, upper_params_norm_sq))
+
     train_loss = hinge_loss(params, bias, X_train, Y_train)
     test_loss = hinge_loss(params, bias, X_test, Y_test)
 
@@ -384,6 +570,7 @@ def generate_upper_and_lower_bounds(
     minimizer,
     verbose=True,
     print_interval=500,
+    dtype=np.float32,
     ):
     """ Generate Upper and Lower Bounds
 
@@ -406,10 +593,14 @@ def generate_upper_and_lower_bounds(
     minimizer : Minimizer
     verbose : bool
     print_interval : int
+    dtype : np.dtype
+        Floating point type of the features and model used in the loop
+        (the candidate attack points are always float64)
 
     Returns
     -------
     X_modified : np.ndarray of shape (instances, dimensions)
+        X_train as given followed by the float64 attack points
     Y_modified : np.ndarray of shape (instances,)
     idx_train : np.ndarray of shape (instances,)
     idx_poison : np.ndarray of shape (instances,)
@@ -421,29 +612,58 @@ def generate_upper_and_lower_bounds(
     best_upper_params_norm_sq :float
     """
 
+    # The loop is dominated by products with X_train (and X_train.T), so
+    # convert it to the working dtype once up front, column major if dense.
+    # The lower bound attack is built from the original X_train.
+    if sparse.issparse(X_train):
+        X_train_loop = X_train.tocsr().astype(dtype, copy=False)
+    else:
+        X_train_loop = np.asfortranarray(X_train, dtype=dtype)
+
     # Initialize Variables as 0
+    # (the attack points stay float64 so rounding does not push them out of the feasible set)
     x_bs = np.zeros((max_iter, X_train.shape[1]))
     y_bs = np.zeros(max_iter)
-    sum_w = np.zeros(X_train.shape[1])
 
     ##########
     # Line 1 #
     ##########
 
     # Initialize Sum of Gradients (z)
-    sum_of_grads_w_sq = np.ones(X_train.shape[1])
-    sum_of_grads_w = np.zeros(X_train.shape[1])
-    sum_of_grads_b = 0
+    sum_of_grads_w = np.zeros(X_train.shape[1], dtype=dtype)
+    sum_of_grads_b = 0.0
+
+    # Running squared norm of the sum of gradients (||z_w||^2)
+    sum_of_grads_w_norm_sq = 0.0
 
     # Initialize Upper Bound (U*)
     best_upper_bound = 10000
 
     # Initialize ??? (\lambda)
-    current_lambda = 1 / learning_rate
+    # The scalars are kept Python floats, since numpy float64 scalars would
+    # promote w (and then the products with X_train) to float64
+    current_lambda = float(1.0 / learning_rate)
+    epsilon = float(epsilon)
 
     # Initialize Model (\theta)
-    w = init_w
-    b = init_b
+    w = np.asarray(init_w, dtype=dtype)
+    b = float(init_b)
+
+    # Per class feasible set parameters, stacked so that the worst
+    # class can be picked with a single argmin in each iteration
+    classes = np.unique(Y_train)
+    class_idxs = np.array([class_map[y] for y in classes])
+    class_centroids = centroids[class_idxs, :]
+    class_sphere_radii = sphere_radii[class_idxs]
+    class_slab_radii = slab_radii[class_idxs]
+    class_x_bs = np.empty((len(classes), X_train.shape[1]))
+
+    # The training data does not change, so scale its rows by the labels once
+    YX_train = get_label_scaled_features(X_train_loop, Y_train)
+
+    # Gradient and margin buffers reused by every iteration
+    grad_w = np.empty(X_train.shape[1], dtype=dtype)
+    good_margins = np.empty(X_train.shape[0], dtype=dtype)
 
     ##########
     # Line 2 #
@@ -455,8 +675,10 @@ def generate_upper_and_lower_bounds(
         # Line 5 (1st Half) #
         #####################
 
-        # Calculate gradient of loss
-        grad_w, grad_b = hinge_grad(w, b, X_train, Y_train)
+        # Calculate gradient of loss (and the loss due to clean data for Line 4)
+        good_loss, grad_w, grad_b, good_margins = hinge_loss_and_grad(
+            w, b, X_train_loop, Y_train, YX=YX_train,
+            out_grad_w=grad_w, out_margins=good_margins)
 
         if verbose: 
             if iter_idx % print_interval == 0:
@@ -469,23 +691,20 @@ def generate_upper_and_lower_bounds(
         # Find the attack point that maximizes loss function.
         # We do not know which class gives the maximum loss.
         # Pick the class with the worse (more negative) margin.
-        worst_margin = None
-        for y_b in set(Y_train):
-
-            class_idx = class_map[y_b]
-            x_b = minimizer.minimize_over_feasible_set(
+        for k, y_b in enumerate(classes):
+            class_x_bs[k, :] = minimizer.minimize_over_feasible_set(
                 y_b, 
                 w, 
-                centroids[class_idx, :], 
+                class_centroids[k, :], 
                 centroid_vec, 
-                sphere_radii[class_idx], 
-                slab_radii[class_idx])
+                class_sphere_radii[k], 
+                class_slab_radii[k])
 
-            margin = y_b * (w.dot(x_b) + b)
-            if (worst_margin is None) or (margin < worst_margin):
-                worst_margin = margin
-                worst_y_b = y_b
-                worst_x_b = x_b
+        margins = classes * (class_x_bs.dot(w) + b)
+        worst_class = np.argmin(margins)
+        worst_margin = margins[worst_class]
+        worst_y_b = classes[worst_class]
+        worst_x_b = class_x_bs[worst_class, :]
 
         #####################
         # Line 5 (2nd Half) #
@@ -511,8 +730,7 @@ def generate_upper_and_lower_bounds(
         # Line 4 (1st Half) #
         #####################
 
-        # Loss due to clean data
-        good_loss = hinge_loss(w, b, X_train, Y_train)
+        # Loss due to clean data was calculated with the gradient in Line 5
         params_norm_sq = (np.linalg.norm(w)**2 + b**2)
 
         # Total Loss of the Poisoned Dataset
@@ -523,7 +741,7 @@ def generate_upper_and_lower_bounds(
             best_upper_good_loss = good_loss
             best_upper_bad_loss = bad_loss
             best_upper_params_norm_sq = params_norm_sq
-            best_upper_good_acc = np.mean((Y_train * (X_train.dot(w) + b)) > 0)
+            best_upper_good_acc = np.mean(good_margins > 0)
             if worst_margin > 0:
                 best_upper_bad_acc = 1.0
             else: 
@@ -543,11 +761,15 @@ def generate_upper_and_lower_bounds(
         ##########
 
         # Update Gradient (z[t] = z[t-1] - g[t])
+        # ||z - g||^2 = ||z||^2 - 2 z^T g + ||g||^2 is updated before z changes
+        sum_of_grads_w_norm_sq += float(grad_w.dot(grad_w) - 2 * sum_of_grads_w.dot(grad_w))
+        sum_of_grads_w_norm_sq = max(sum_of_grads_w_norm_sq, 0.0)
         sum_of_grads_w -= grad_w
-        sum_of_grads_b -= grad_b
+        sum_of_grads_b -= float(grad_b)
 
         # Update ?? (\lambda[t] = max(...))
-        candidate_lambda = np.sqrt(np.linalg.norm(sum_of_grads_w)**2 + sum_of_grads_b**2) / np.sqrt(norm_sq_constraint)
+        # (kept a Python float so dividing by lambda does not promote w)
+        candidate_lambda = float(np.sqrt(sum_of_grads_w_norm_sq + sum_of_grads_b**2) / np.sqrt(norm_sq_constraint))
         if candidate_lambda > current_lambda:
             current_lambda = candidate_lambda            
 
@@ -592,35 +814,7 @@ def cvx_dot(a, b):
     dot : ???
         Dot product of a and b
     """
-    return cvx.sum_entries(cvx.mul_elemwise(a, b))
-
-
-def get_projection_matrix(w, centroid, centroid_vec):
-    """ Get Projection Matrix
-
-    Parameters
-    ----------
-    w : np.ndarray of shape (dimensions,)
-    centroid : np.ndarray of shape (classes, dimensions)
-    centroid_vec : np.ndarray of shape (dimensions,)
-
-    Returns
-    -------
-    P : np.ndarray of shape (3, dimensions)
-        Projection matrix that projects a vector onto the subspace spanned by
-            w, centroid, and centroid_vec
-    """
-    subspace = np.concatenate((
-        w.reshape(1, -1),
-        centroid.reshape(1, -1),
-        centroid_vec.reshape(1, -1)),
-        axis=0)
-    P = orth(subspace.T).T
-    while P.shape[0] < 3:
-        P = np.concatenate((P, np.random.normal(size=(1, P.shape[1]))), axis=0)
-        P = orth(P.T).T
-
-    return P
+    return cvx.sum(cvx.multiply(a, b))
 
 
 class Minimizer(object):
@@ -658,25 +852,27 @@ class Minimizer(object):
             Use slab projection?
         """
 
+        self.use_sphere = use_sphere
+        self.use_slab = use_slab
+
         d = 3
 
-        self.cvx_x = cvx.Variable(d)
-        self.cvx_y = cvx.Parameter(1)        
-        self.cvx_w = cvx.Parameter(d)
-        self.cvx_centroid = cvx.Parameter(d)
+        # Posed in the offset from the centroid, x_c = x - c, as in
+        # certml.utils.cvx.Projector
+        self.cvx_x_c = cvx.Variable(d)
+        self.cvx_yw = cvx.Parameter(d)
         self.cvx_centroid_vec = cvx.Parameter(d)
-        self.cvx_sphere_radius = cvx.Parameter(1)
-        self.cvx_slab_radius = cvx.Parameter(1)
-
-        self.cvx_x_c = self.cvx_x - self.cvx_centroid
+        self.cvx_sphere_radius = cvx.Parameter()
+        self.cvx_slab_radius = cvx.Parameter()
 
         self.constraints = []
         if use_sphere:
-            self.constraints.append(cvx.norm(self.cvx_x_c, 2) < self.cvx_sphere_radius)
+            self.constraints.append(cvx.norm(self.cvx_x_c, 2) <= self.cvx_sphere_radius)
         if use_slab:
-            self.constraints.append(cvx.abs(cvx_dot(self.cvx_centroid_vec, self.cvx_x_c)) < self.cvx_slab_radius)
+            self.constraints.append(cvx.abs(cvx_dot(self.cvx_centroid_vec, self.cvx_x_c)) <= self.cvx_slab_radius)
 
-        self.objective = cvx.Maximize(1 - self.cvx_y * cvx_dot(self.cvx_w, self.cvx_x))
+        # 1 - y w^T x = (1 - y w^T c) - y w^T x_c, and the first term is constant
+        self.objective = cvx.Maximize(-cvx_dot(self.cvx_yw, self.cvx_x_c))
 
         self.prob = cvx.Problem(self.objective, self.constraints)
 
@@ -708,175 +904,23 @@ class Minimizer(object):
         x : np.ndarray
             Optimal x;
         """
-        P = get_projection_matrix(w, centroid, centroid_vec)
-        
-        self.cvx_y.value = y
-        self.cvx_w.value = P.dot(w.reshape(-1))
-        self.cvx_centroid.value = P.dot(centroid.reshape(-1))
-        self.cvx_centroid_vec.value = P.dot(centroid_vec.reshape(-1))
-        self.cvx_sphere_radius.value = sphere_radius
-        self.cvx_slab_radius.value = slab_radius
-
-        self.prob.solve(verbose=verbose)
-
-        x_opt = np.array(self.cvx_x.value).reshape(-1)
-        
-        return x_opt.dot(P)
-
-
-class NearestPointFinder(object):
-    """ Nearest Point Finder
-
-    We can speed this up by expressing the constraints in one dimension,
-    but let's see how it goes first.
-
-    Solve the optimization problem:
-
-    """
-
-    def __init__(self, d):
-        """ Nearest Point Finder
-
-        Parameters
-        ----------
-        d : ???
-            ???
-        """
-
-        self.cvx_c = cvx.Variable(1)
-        self.cvx_y = cvx.Parameter(1)
-        self.cvx_g = cvx.Parameter(d)        
-        self.cvx_theta = cvx.Parameter(d)
-        self.cvx_centroid = cvx.Parameter(d)
-        self.cvx_centroid_vec = cvx.Parameter(d)
-        self.cvx_sphere_radius = cvx.Parameter(1)
-        self.cvx_slab_radius = cvx.Parameter(1)
-
-        # want grad of poisoned point = -g
-        # grad of point (cyg, y) = -cg
-        # so we want to find c > 0 such that n_poison/n * -cg = -g with 0 < n_poison as low as possible 
-        # and (cyg, y) in the feasible set.
-        # since n_poison/n > 0, c must > 0. Then n_poison/n = 1/c, 
-        # so we want c to be as large as possible.
-        # As a sanity check, we know that g itself is in conv(feasible set of gradients).
-        # We can hope that either (-g, 1) or (g, -1) is in the feasible set of inputs,
-        # because the gradients at each of those points is g
-        # so if we let c = -1 then this should work.
-
-        self.cvx_x = self.cvx_c * self.cvx_y * self.cvx_g
-        self.cvx_x_c = self.cvx_x - self.cvx_centroid
-        self.constraints = [
-            cvx.norm(self.cvx_x_c, 2) < self.cvx_sphere_radius, 
-            cvx.abs(cvx_dot(self.cvx_centroid_vec, self.cvx_x_c)) < self.cvx_slab_radius,
-            self.cvx_y * cvx_dot(self.cvx_theta, self.cvx_x) < 1,
-            self.cvx_c > 0]
-
-        self.objective = cvx.Maximize(self.cvx_c)
-
-        self.prob = cvx.Problem(self.objective, self.constraints)
-
-    def find_nearest_point(self, y, g, theta, 
-                           centroid, centroid_vec, sphere_radius, slab_radius,
-                           verbose=False):
-        """ Find Nearest Point
-
-        Parameters
-        ----------
-        y : int
-        g : ??
-        theta :
-        centroid : np.ndarray of shape (classes, dimensions)
-        centroid_vec : np.ndarray of shape (dimensions,)
-        sphere_radius : np.ndarray of shape (classes,)
-        slab_radius : np.ndarray of shape (classes,)
-        verbose : bool
-            CVX verbose
-
-        Returns
-        -------
-        c_opt :
-            Optimal C value
-        """
-        self.cvx_y.value = y
-        self.cvx_g.value = g.reshape(-1)
-        self.cvx_theta.value = theta.reshape(-1)
-        self.cvx_centroid.value = centroid.reshape(-1)
-        self.cvx_centroid_vec.value = centroid_vec.reshape(-1)
-        self.cvx_sphere_radius.value = sphere_radius
-        self.cvx_slab_radius.value = slab_radius
-
-        self.prob.solve(verbose=verbose)
-
-        c_opt = self.cvx_c.value
-        return c_opt
-
-
-class Projector(object):
-    """ Projector ???
-
-    Solves the optimization problem:
-    TODO
-    """
-
-    def __init__(self, use_sphere=True, use_slab=True):
-        """ Projector ???
-
-        Parameters
-        ----------
-        use_sphere
-        use_slab
-        """
-
-        d = 3
-
-        self.cvx_x = cvx.Variable(d)
-        self.cvx_z = cvx.Parameter(d)
-        self.cvx_centroid = cvx.Parameter(d)
-        self.cvx_centroid_vec = cvx.Parameter(d)
-        self.cvx_sphere_radius = cvx.Parameter(1)
-        self.cvx_slab_radius = cvx.Parameter(1)
+        # With a bounded sphere the problem has a closed form solution,
+        # so CVX is only needed for the (unbounded) slab only problem
+        if self.use_sphere and np.isfinite(sphere_radius):
+            if not self.use_slab:
+                slab_radius = np.inf
+            return minimize_linear_over_feasible_set(
+                y * w, centroid, centroid_vec, sphere_radius, slab_radius)
 
-        self.cvx_x_c = self.cvx_x - self.cvx_centroid
-
-        self.constraints = []
-        if use_sphere:
-            self.constraints.append(cvx.norm(self.cvx_x_c, 2) < self.cvx_sphere_radius)
-        if use_slab:
-            self.constraints.append(cvx.abs(cvx_dot(self.cvx_centroid_vec, self.cvx_x_c)) < self.cvx_slab_radius)
-
-        self.objective = cvx.Minimize(cvx.norm(self.cvx_x - self.cvx_z, 2))        
-
-        self.prob = cvx.Problem(self.objective, self.constraints)
-
-    def project_onto_feasible_set(self, z, centroid, centroid_vec, sphere_radius, slab_radius,
-                                   verbose=False):
-        """ Project onto Feasible Set
-
-        Parameters
-        ----------
-        z : ??
-        centroid : np.ndarray of shape (classes, dimension)
-        centroid_vec : np.ndarray of shape (dimensions,)
-        sphere_radius : np.ndarray of shape (classes,)
-        slab_radius : np.ndarray of shape (classes,)
-        verbose : bool
-
-        Returns
-        -------
-        x_proj :
-            Data projected onto feasible set
-        """
-
-        P = get_projection_matrix(z, centroid, centroid_vec)
+        P = get_projection_matrix(w, centroid, centroid_vec)
         
-        self.cvx_z.value = P.dot(z.reshape(-1))
-        self.cvx_centroid.value = P.dot(centroid.reshape(-1))
+        self.cvx_yw.value = P.dot(y * w.reshape(-1))
         self.cvx_centroid_vec.value = P.dot(centroid_vec.reshape(-1))
         self.cvx_sphere_radius.value = sphere_radius
         self.cvx_slab_radius.value = slab_radius
 
-        self.prob.solve(verbose=verbose)
+        self.prob.solve(warm_start=True, verbose=verbose)
 
-        x_opt = np.array(self.cvx_x.value).reshape(-1)
+        x_c_opt = np.array(self.cvx_x_c.value).reshape(-1)
         
-        return x_opt.dot(P)
+        return x_c_opt.dot(P) + centroid.reshape(-1)
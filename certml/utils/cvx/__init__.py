@@ -1,3 +1,3 @@
-from .cvx import cvx_dot, NearestPointFinder, Projector
+from .cvx import cvx_dot, cvx_project, NearestPointFinder, Projector
 
-__all__ = ['cvx_dot', 'NearestPointFinder', 'Projector']
+__all__ = ['cvx_dot', 'cvx_project', 'NearestPointFinder', 'Projector']
@@ -18,7 +18,32 @@ def cvx_dot(a, b):
     dot : ???
         Dot product of a and b
     """
-    return cvx.sum_entries(cvx.mul_elemwise(a, b))
+    return cvx.sum(cvx.multiply(a, b))
+
+
+def cvx_project(project, v):
+    """ Project onto Subspace
+
+    Works for both numpy arrays and CVX parameters, so the same
+    objective and constraint builders can be used for cached problems.
+
+    Parameters
+    ----------
+    project : np.ndarray or cvx.Parameter of shape (subspace, dimensions)
+        Projection matrix
+    v : np.ndarray or cvx.Parameter of shape (dimensions,)
+        Vector to project
+
+    Returns
+    -------
+    v_proj : np.ndarray or CVX expression of shape (subspace,)
+        Projected vector
+    """
+    if isinstance(project, cvx.expressions.expression.Expression):
+        if isinstance(v, np.ndarray):
+            v = v.reshape(-1)
+        return cvx.matmul(project, v)
+    return project.dot(v.reshape(-1))
 
 
 class NearestPointFinder(object):
@@ -40,14 +65,16 @@ class NearestPointFinder(object):
             ???
         """
 
-        self.cvx_c = cvx.Variable(1)
-        self.cvx_y = cvx.Parameter(1)
-        self.cvx_g = cvx.Parameter(d)
-        self.cvx_theta = cvx.Parameter(d)
+        # Every parameter enters affinely (DPP), so cvxpy compiles the problem
+        # once and reuses it across solves
+        self.cvx_c = cvx.Variable()
+        self.cvx_yg = cvx.Parameter(d)
         self.cvx_centroid = cvx.Parameter(d)
-        self.cvx_centroid_vec = cvx.Parameter(d)
-        self.cvx_sphere_radius = cvx.Parameter(1)
-        self.cvx_slab_radius = cvx.Parameter(1)
+        self.cvx_slab_coef = cvx.Parameter()
+        self.cvx_slab_offset = cvx.Parameter()
+        self.cvx_margin_coef = cvx.Parameter()
+        self.cvx_sphere_radius = cvx.Parameter()
+        self.cvx_slab_radius = cvx.Parameter()
 
         # want grad of poisoned point = -g
         # grad of point (cyg, y) = -cg
@@ -60,13 +87,13 @@ class NearestPointFinder(object):
         # because the gradients at each of those points is g
         # so if we let c = -1 then this should work.
 
-        self.cvx_x = self.cvx_c * self.cvx_y * self.cvx_g
+        self.cvx_x = self.cvx_c * self.cvx_yg
         self.cvx_x_c = self.cvx_x - self.cvx_centroid
         self.constraints = [
-            cvx.norm(self.cvx_x_c, 2) < self.cvx_sphere_radius,
-            cvx.abs(cvx_dot(self.cvx_centroid_vec, self.cvx_x_c)) < self.cvx_slab_radius,
-            self.cvx_y * cvx_dot(self.cvx_theta, self.cvx_x) < 1,
-            self.cvx_c > 0]
+            cvx.norm(self.cvx_x_c, 2) <= self.cvx_sphere_radius,
+            cvx.abs(self.cvx_c * self.cvx_slab_coef - self.cvx_slab_offset) <= self.cvx_slab_radius,
+            self.cvx_c * self.cvx_margin_coef <= 1,
+            self.cvx_c >= 0]
 
         self.objective = cvx.Maximize(self.cvx_c)
 
@@ -94,15 +121,19 @@ class NearestPointFinder(object):
         c_opt :
             Optimal C value
         """
-        self.cvx_y.value = y
-        self.cvx_g.value = g.reshape(-1)
-        self.cvx_theta.value = theta.reshape(-1)
-        self.cvx_centroid.value = centroid.reshape(-1)
-        self.cvx_centroid_vec.value = centroid_vec.reshape(-1)
+        yg = y * g.reshape(-1)
+        centroid = centroid.reshape(-1)
+        centroid_vec = centroid_vec.reshape(-1)
+
+        self.cvx_yg.value = yg
+        self.cvx_centroid.value = centroid
+        self.cvx_slab_coef.value = centroid_vec.dot(yg)
+        self.cvx_slab_offset.value = centroid_vec.dot(centroid)
+        self.cvx_margin_coef.value = y * theta.reshape(-1).dot(yg)
         self.cvx_sphere_radius.value = sphere_radius
         self.cvx_slab_radius.value = slab_radius
 
-        self.prob.solve(verbose=verbose)
+        self.prob.solve(warm_start=True, verbose=verbose)
 
         c_opt = self.cvx_c.value
         return c_opt
@@ -126,22 +157,20 @@ class Projector(object):
 
         d = 3
 
-        self.cvx_x = cvx.Variable(d)
-        self.cvx_z = cvx.Parameter(d)
-        self.cvx_centroid = cvx.Parameter(d)
+        # Posed in the offset from the centroid to keep the problem DPP
+        self.cvx_x_c = cvx.Variable(d)
+        self.cvx_z_c = cvx.Parameter(d)
         self.cvx_centroid_vec = cvx.Parameter(d)
-        self.cvx_sphere_radius = cvx.Parameter(1)
-        self.cvx_slab_radius = cvx.Parameter(1)
-
-        self.cvx_x_c = self.cvx_x - self.cvx_centroid
+        self.cvx_sphere_radius = cvx.Parameter()
+        self.cvx_slab_radius = cvx.Parameter()
 
         self.constraints = []
         if use_sphere:
-            self.constraints.append(cvx.norm(self.cvx_x_c, 2) < self.cvx_sphere_radius)
+            self.constraints.append(cvx.norm(self.cvx_x_c, 2) <= self.cvx_sphere_radius)
         if use_slab:
-            self.constraints.append(cvx.abs(cvx_dot(self.cvx_centroid_vec, self.cvx_x_c)) < self.cvx_slab_radius)
+            self.constraints.append(cvx.abs(cvx_dot(self.cvx_centroid_vec, self.cvx_x_c)) <= self.cvx_slab_radius)
 
-        self.objective = cvx.Minimize(cvx.norm(self.cvx_x - self.cvx_z, 2))
+        self.objective = cvx.Minimize(cvx.norm(self.cvx_x_c - self.cvx_z_c, 2))
 
         self.prob = cvx.Problem(self.objective, self.constraints)
 
@@ -166,14 +195,16 @@ class Projector(object):
 
         P = get_projection_matrix(z, centroid, centroid_vec)
 
-        self.cvx_z.value = P.dot(z.reshape(-1))
-        self.cvx_centroid.value = P.dot(centroid.reshape(-1))
+        centroid = centroid.reshape(-1)
+
+        self.cvx_z_c.value = P.dot(z.reshape(-1) - centroid)
         self.cvx_centroid_vec.value = P.dot(centroid_vec.reshape(-1))
         self.cvx_sphere_radius.value = sphere_radius
         self.cvx_slab_radius.value = slab_radius
 
-        self.prob.solve(verbose=verbose)
+        self.prob.solve(warm_start=True, verbose=verbose)
 
-        x_opt = np.array(self.cvx_x.value).reshape(-1)
+        # The centroid is in the span of P, so it is added back unprojected
+        x_c_opt = np.array(self.cvx_x_c.value).reshape(-1)
 
-        return x_opt.dot(P)
+        return x_c_opt.dot(P) + centroid
@@ -1,10 +1,12 @@
 from .data import generate_class_map, get_centroids, get_centroid_vec, get_sqrt_inv_cov, \
     get_data_params, add_points, copy_random_points, threshold, rround, \
     project_onto_sphere, project_onto_slab, get_projection_fn, filter_points_outside_feasible_set, \
-    get_projection_matrix, compute_dists_under_Q, remove_quantile
+    get_projection_matrix, minimize_linear_over_feasible_set, compute_dists_under_Q, \
+    remove_quantile, sample_without_replacement
 
 __all__ = ['generate_class_map', 'get_centroids', 'get_centroid_vec', 'get_sqrt_inv_cov',
            'get_data_params', 'add_points', 'copy_random_points', 'threshold',
            'rround', 'project_onto_sphere', 'project_onto_slab',
            'get_projection_fn', 'filter_points_outside_feasible_set', 'get_projection_matrix',
-           'compute_dists_under_Q', 'remove_quantile']
+           'minimize_linear_over_feasible_set', 'compute_dists_under_Q', 'remove_quantile',
+           'sample_without_replacement']
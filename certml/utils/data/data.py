@@ -2,8 +2,6 @@
 
 import numpy as np
 import scipy.sparse as sparse
-from scipy.linalg import orth
-from certml.legacy import upper_bounds
 from sklearn import metrics
 
 
@@ -254,19 +252,55 @@ def copy_random_points(X, Y, mask_to_choose_from=None, target_class=1, num_copie
     return X_modified, Y_modified
 
 
+def sample_without_replacement(n, k):
+    """ Sample Without Replacement
+
+    Draws k distinct integers from range(n). np.random.choice(n, k, replace=False)
+    permutes all of range(n), so when k is much smaller than n this instead draws
+    k integers with replacement and redraws only the duplicates. Each round is
+    vectorized and removes all but about k / n of the duplicates, so only a few
+    rounds are needed. The samples are not in random order.
+
+    Parameters
+    ----------
+    n : int
+        Size of the population
+    k : int
+        Number of samples
+
+    Returns
+    -------
+    samples : np.ndarray of shape (k,)
+        Distinct samples from range(n)
+    """
+    if k > n:
+        raise ValueError('Cannot take %s samples without replacement from %s' % (k, n))
+
+    # With many duplicates a permutation is as cheap
+    if 4 * k > n:
+        return np.random.permutation(n)[:k]
+
+    samples = np.unique(np.random.randint(0, n, size=k))
+    while samples.size < k:
+        samples = np.union1d(samples, np.random.randint(0, n, size=k - samples.size))
+    return samples
+
+
 def threshold(X):
     """ Set all Negative Values in X to 0
 
     Parameters
     ----------
-    X : np.ndarray of shape (instances, dimensions)
+    X : np.ndarray or scipy.sparse matrix of shape (instances, dimensions)
         Input features
 
     Returns
     -------
-    X_clip : np.ndarray of shape (instances, dimensions)
-        Clipped input features
+    X_clip : np.ndarray or scipy.sparse.csr_matrix of shape (instances, dimensions)
+        Clipped input features, sparse if X is sparse
     """
+    if sparse.issparse(X):
+        return sparse.csr_matrix(X.maximum(0))
     return np.clip(X, 0, np.max(X))
 
 
@@ -279,15 +313,23 @@ def rround(X, random_seed=3):
 
     Parameters
     ----------
-    X : np.ndarray of shape (instances, dimensions)
+    X : np.ndarray or scipy.sparse matrix of shape (instances, dimensions)
         Input features
     random_seed : int
         Numpy random seed
 
     Returns
     -------
-    X_rround : np.ndarray of shape (instances, dimensions)
+    X_rround : np.ndarray or scipy.sparse.csr_matrix of shape (instances, dimensions)
+        Rounded input features, sparse if X is sparse
     """
+    # Zeros are never rounded up, so only the stored values need rounding
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X, dtype=float, copy=True)
+        X.data = rround(X.data, random_seed)
+        X.eliminate_zeros()
+        return X
+
     X_frac, X_int = np.modf(X)
     X = X_int + (np.random.random_sample(X.shape) < X_frac)
     return X
@@ -410,7 +452,9 @@ def get_projection_fn(X_clean, Y_clean, sphere=True, slab=True, percentile=70):
 
     class_map, centroids, centroid_vec, sphere_radii, slab_radii = get_data_params(X_clean, Y_clean, percentile)
     if sphere and slab:
-        projector = upper_bounds.Projector()
+        # certml.utils.cvx imports this module, so import it here
+        from certml.utils.cvx import Projector
+        projector = Projector()
 
         def project_onto_feasible_set(X, Y):
             num_examples = X.shape[0]
@@ -503,20 +547,115 @@ def get_projection_matrix(w, centroid, centroid_vec):
         Projection matrix that projects a vector onto the subspace spanned by
             w, centroid, and centroid_vec
     """
-    assert w.size > 3, 'Dimensionality must be greater than 3 to project to 3 dimensions'
-    subspace = np.concatenate((
-        w.reshape(1, -1),
-        centroid.reshape(1, -1),
-        centroid_vec.reshape(1, -1)),
-        axis=0)
-    P = orth(subspace.T).T
-    while P.shape[0] < 3:
-        P = np.concatenate((P, np.random.normal(size=(1, P.shape[1]))), axis=0)
-        P = orth(P.T).T
+    assert w.size >= 3, 'Dimensionality must be at least 3 to project to 3 dimensions'
+    P = np.zeros((3, w.size))
+    rank = 0
+
+    # Modified Gram-Schmidt on the three vectors. This is O(dimensions)
+    # and avoids an SVD of the 3 x dimensions subspace.
+    for v in (w, centroid, centroid_vec):
+        v = np.array(v, dtype=float).reshape(-1)
+        v_norm = np.linalg.norm(v)
+        for i in range(rank):
+            v -= P[i, :].dot(v) * P[i, :]
+        residual_norm = np.linalg.norm(v)
+        if residual_norm > 1e-10 * v_norm:
+            P[rank, :] = v / residual_norm
+            rank += 1
+
+    # If the vectors are linearly dependent, complete the basis
+    # deterministically with the first independent standard basis vectors
+    k = 0
+    while rank < 3:
+        v = np.zeros(w.size)
+        v[k] = 1.0
+        for i in range(rank):
+            v -= P[i, :].dot(v) * P[i, :]
+        residual_norm = np.linalg.norm(v)
+        if residual_norm > 1e-10:
+            P[rank, :] = v / residual_norm
+            rank += 1
+        k += 1
 
     return P
 
 
+def minimize_linear_over_feasible_set(g, centroid, centroid_vec, sphere_radius, slab_radius, margin=1e-8):
+    """ Minimize a Linear Function over the Feasible Set
+
+    Solves the optimization problem
+
+    .. math
+        min_x & g^T x
+        s.t.  & || x - c ||2 <= r_sphere
+              & |<x - c, c_vec>| <= r_slab
+
+    in closed form. The optimal point lies in the span of g and c_vec
+    around the centroid. It moves against g to the edge of the sphere,
+    unless that leaves the slab, in which case it sits on the edge of the
+    slab and uses the remaining sphere radius orthogonal to c_vec.
+
+    The optimum is on the boundary, where rounding would leave about half of
+    the points just outside the feasible set. Both radii are shrunk by a
+    small relative margin so the point is strictly inside.
+
+    Parameters
+    ----------
+    g : np.ndarray of shape (dimensions,)
+        Objective function weights
+    centroid : np.ndarray of shape (dimensions,)
+        Class centroid
+    centroid_vec : np.ndarray of shape (1, dimensions)
+        Vector between the two class centroids
+    sphere_radius : float
+        Sphere radius (must be finite)
+    slab_radius : float
+        Slab radius
+    margin : float
+        Relative amount the radii are shrunk by
+
+    Returns
+    -------
+    x_opt : np.ndarray of shape (dimensions,)
+        The optimal point
+    """
+    sphere_radius = sphere_radius * (1 - margin)
+    slab_radius = slab_radius * (1 - margin)
+
+    g = np.asarray(g, dtype=float).reshape(-1)
+    centroid = centroid.reshape(-1)
+    v = centroid_vec.reshape(-1)
+
+    # Normalize the slab so that it is given in terms of a unit vector
+    v_norm = np.linalg.norm(v)
+    v = v / v_norm
+    slab_radius = slab_radius / v_norm
+
+    # Split the objective into components along and orthogonal to the slab
+    g_v = g.dot(v)
+    g_perp = g - g_v * v
+    g_perp_norm = np.linalg.norm(g_perp)
+    g_norm = np.sqrt(g_v ** 2 + g_perp_norm ** 2)
+
+    if g_norm == 0:
+        return centroid.copy()
+
+    # Move against the objective to the edge of the sphere
+    alpha = -sphere_radius * g_v / g_norm
+    beta = sphere_radius * g_perp_norm / g_norm
+
+    # The slab is active, so stop at its edge and put the rest of the
+    # sphere radius into the orthogonal component
+    if np.abs(alpha) > slab_radius:
+        alpha = -np.sign(g_v) * slab_radius
+        beta = np.sqrt(sphere_radius ** 2 - slab_radius ** 2)
+
+    x_opt = centroid + alpha * v
+    if g_perp_norm > 0:
+        x_opt -= beta * g_perp / g_perp_norm
+    return x_opt
+
+
 def remove_quantile(X, Y, dists, frac_to_remove):
     """ Remove Quantile
 
@@ -0,0 +1,121 @@
+"""Data Utilities Unit Tests"""
+
+import numpy as np
+import pytest
+import scipy.sparse as sparse
+from certml.utils.data import get_projection_matrix, minimize_linear_over_feasible_set, \
+    filter_points_outside_feasible_set, sample_without_replacement, threshold, rround
+
+
+class TestGetProjectionMatrix(object):
+    """Get Projection Matrix Unit Tests"""
+
+    def test_orthonormal_span(self):
+        w = np.array([1.0, 2.0, 0.0, 0.0, 1.0])
+        c = np.array([0.0, 1.0, 1.0, 0.0, 0.0])
+        c_vec = np.array([[3.0, 0.0, 0.0, 1.0, 0.0]])
+        P = get_projection_matrix(w, c, c_vec)
+        assert P.shape == (3, 5)
+        assert np.allclose(P.dot(P.T), np.eye(3))
+        for v in (w, c, c_vec.reshape(-1)):
+            assert np.allclose(P.T.dot(P.dot(v)), v)
+
+    def test_dependent_vectors(self):
+        w = np.array([1.0, 1.0, 0.0, 0.0])
+        P = get_projection_matrix(w, 2 * w, np.zeros((1, 4)))
+        assert P.shape == (3, 4)
+        assert np.allclose(P.dot(P.T), np.eye(3))
+        assert np.allclose(P.T.dot(P.dot(w)), w)
+
+    def test_three_dimensions(self):
+        w = np.array([1.0, 1.0, 0.0])
+        P = get_projection_matrix(w, 2 * w, np.zeros((1, 3)))
+        assert P.shape == (3, 3)
+        assert np.allclose(P.dot(P.T), np.eye(3))
+
+
+class TestMinimizeLinearOverFeasibleSet(object):
+    """Minimize Linear Function over Feasible Set Unit Tests"""
+
+    def test_sphere_only(self):
+        g = np.array([3.0, 4.0, 0.0, 0.0])
+        c = np.array([1.0, 1.0, 1.0, 1.0])
+        c_vec = np.array([[0.0, 0.0, 1.0, 0.0]])
+        x = minimize_linear_over_feasible_set(g, c, c_vec, 5.0, np.inf)
+        assert np.allclose(x, c - g)
+
+    def test_slab_active(self):
+        g = np.array([1.0, 0.0, 0.0, 0.0])
+        c = np.zeros(4)
+        c_vec = np.array([[1.0, 0.0, 0.0, 0.0]])
+        x = minimize_linear_over_feasible_set(g, c, c_vec, 2.0, 1.0)
+        assert np.allclose(x, [-1.0, 0.0, 0.0, 0.0])
+
+    def test_slab_and_sphere_active(self):
+        g = np.array([1.0, 1.0, 0.0, 0.0])
+        c = np.zeros(4)
+        c_vec = np.array([[1.0, 0.0, 0.0, 0.0]])
+        x = minimize_linear_over_feasible_set(g, c, c_vec, 2.0, 1.0)
+        assert np.allclose(x, [-1.0, -np.sqrt(3.0), 0.0, 0.0])
+        assert np.isclose(np.linalg.norm(x - c), 2.0)
+
+    def test_strictly_feasible(self):
+        rng = np.random.RandomState(0)
+        centroids = 100 * rng.normal(size=(2, 10))
+        centroid_vec = (centroids[0, :] - centroids[1, :]).reshape(1, -1)
+        centroid_vec /= np.linalg.norm(centroid_vec)
+        sphere_radii = np.array([3.0, 5.0])
+        slab_radii = np.array([1.0, 2.0])
+        class_map = {-1: 0, 1: 1}
+
+        Y = np.where(rng.uniform(size=300) > 0.5, 1, -1)
+        X = np.array([
+            minimize_linear_over_feasible_set(
+                rng.normal(size=10), centroids[class_map[y], :], centroid_vec,
+                sphere_radii[class_map[y]], slab_radii[class_map[y]])
+            for y in Y])
+
+        X_kept, _ = filter_points_outside_feasible_set(
+            X, Y, centroids, centroid_vec, sphere_radii, slab_radii, class_map)
+        assert X_kept.shape[0] == X.shape[0]
+
+    def test_zero_objective(self):
+        c = np.array([1.0, 2.0, 3.0, 4.0])
+        c_vec = np.array([[1.0, 0.0, 0.0, 0.0]])
+        x = minimize_linear_over_feasible_set(np.zeros(4), c, c_vec, 2.0, 1.0)
+        assert np.allclose(x, c)
+
+
+class TestSampleWithoutReplacement(object):
+    """Sample Without Replacement Unit Tests"""
+
+    @pytest.mark.parametrize('n, k', [(100, 10), (100, 30), (10000, 300)])
+    def test_distinct_in_range(self, n, k):
+        np.random.seed(0)
+        samples = sample_without_replacement(n, k)
+        assert samples.shape == (k,)
+        assert len(set(samples)) == k
+        assert np.all((samples >= 0) & (samples < n))
+
+    def test_whole_population(self):
+        np.random.seed(0)
+        samples = sample_without_replacement(10, 10)
+        assert np.array_equal(np.sort(samples), np.arange(10))
+
+    def test_too_many_samples(self):
+        with pytest.raises(ValueError):
+            sample_without_replacement(3, 4)
+
+
+class TestRandomRound(object):
+    """Threshold and Random Round Unit Tests"""
+
+    def test_sparse(self):
+        X = np.array([[-1.5, 0.0, 2.0], [0.0, 3.25, -0.5]])
+
+        X_sparse = rround(threshold(sparse.csr_matrix(X)))
+
+        assert sparse.isspmatrix_csr(X_sparse)
+        assert np.array_equal(X_sparse.toarray()[:, [0, 2]], [[0.0, 2.0], [0.0, 0.0]])
+        assert X_sparse[1, 1] in (3.0, 4.0)
+        assert np.array_equal(threshold(X), np.maximum(X, 0))
@@ -16,5 +16,6 @@ setup(
         'numpy',
         'scipy',
         'scikit-learn',
+        'joblib',
     ],
 )
\ No newline at end of file